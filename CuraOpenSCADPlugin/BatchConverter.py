@@ -0,0 +1,200 @@
+# Renders every cura-export part of .scad files without Cura, one mesh file per part and a
+# manifest.json with names, groups and settings
+#   python -m CuraOpenSCADPlugin.BatchConverter -o out [-j jobs] [--cache dir] file.scad ...
+
+# built-ins
+import os
+import re
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .CommentParser import CommentParser
+from . import CommentScanner
+from . import WriteBack
+from . import OpenSCADBinary
+from .OpenSCADProcess import RenderError
+from .RenderCache import RenderCache
+from .Renderer import Renderer, scratchDirectory
+from . import Instrumentation
+from .RenderServer import RenderServer
+
+
+class _Log(object):
+    # stands in for the reader in CommentParser
+    def __init__(self, file_name):
+        self.file_name = file_name
+
+    def log(self, level, message):
+        sys.stderr.write("{0}: {1}: {2}\n".format(self.file_name, level, message))
+
+
+def _safe(name):
+    return re.sub(r'[^\w.-]+', '_', name).strip('_') or 'part'
+
+
+def readParts(file_name):
+    # [ObjectDict] of all cura-export blocks, every block is one group
+    parser = CommentParser(_Log(file_name))
+    WriteBack.recover(file_name)
+    return [parser.read(comment.text) for comment in CommentScanner.scanFile(file_name)
+            if comment.kind == 'export']
+
+
+class BatchConverter(object):
+    def __init__(self, output, renderer, jobs=None, timeout=None, flags=(), cached=False):
+        self.output = output
+        # renders that did not come from the cache are cache misses
+        self.cached = cached
+        self.renderer = renderer
+        self.jobs = jobs or os.cpu_count() or 1
+        self.timeout = timeout
+        self.flags = list(flags)
+        self._scratch = None
+        self._lock = threading.Lock()
+        self._names = set()
+
+    def _meshFile(self, file_name, name):
+        # unique mesh file name below output/<file name>/
+        directory = _safe(os.path.splitext(os.path.basename(file_name))[0])
+        with self._lock:
+            path = os.path.join(directory, "{0}.{1}".format(_safe(name), self.renderer.extension))
+            count = 1
+            while path in self._names:
+                count += 1
+                path = os.path.join(directory, "{0}_{1}.{2}".format(_safe(name), count, self.renderer.extension))
+            self._names.add(path)
+        return path
+
+    def _render(self, file_name, source, mesh_file):
+        wrapper = os.path.join(self._scratch, "{0}.scad".format(os.path.splitext(mesh_file)[0].replace(os.sep, '-')))
+        output = os.path.join(self.output, mesh_file)
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(wrapper, 'w') as f:
+            f.write('!{0};\ninclude <{1}>;\n'.format(source, file_name))
+        try:
+            try:
+                mesh, result = self.renderer.render(wrapper, output, self.flags, self.timeout)
+            except RenderError as e:
+                if e.result is not None:
+                    self._record(file_name, source, e.result)
+                raise
+            if mesh != output:
+                shutil.copyfile(mesh, output)
+            if result is None:
+                Instrumentation.count("cache hit", file=file_name)
+            else:
+                self._record(file_name, source, result)
+                if self.cached:
+                    Instrumentation.count("cache miss", file=file_name)
+            return result
+        finally:
+            os.remove(wrapper)
+
+    @staticmethod
+    def _record(file_name, source, result):
+        Instrumentation.add(Instrumentation.OPENSCAD, file_name, duration=result.wall_time, part=source,
+                            cpu_time=result.cpu_time, peak_rss=result.peak_rss, returncode=result.returncode)
+
+    def convert(self, file_names):
+        # manifest of all files, parts of all files are rendered at the same time
+        manifest = {"openscad": self.renderer.version, "files": []}
+        self._scratch = tempfile.mkdtemp(prefix="batch-", dir=scratchDirectory())
+        try:
+            with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+                futures = []
+                for file_name in file_names:
+                    file_name = os.path.abspath(file_name)
+                    entry = {"file": file_name, "groups": []}
+                    manifest["files"].append(entry)
+                    try:
+                        with Instrumentation.span(Instrumentation.PARSE, file_name):
+                            parts = readParts(file_name)
+                    except (OSError, SyntaxError) as e:
+                        entry["error"] = str(e)
+                        continue
+                    for index, part in enumerate(parts):
+                        group = {"index": index, "parts": []}
+                        entry["groups"].append(group)
+                        if part is None:
+                            group["error"] = "syntax error in cura-export comment"
+                            continue
+                        for obj, settings in part.items():
+                            item = {"name": obj.name, "type": obj.type, "source": obj.source,
+                                    "settings": settings}
+                            group["parts"].append(item)
+                            if obj.type == "scad":
+                                item["mesh"] = self._meshFile(file_name, obj.name or obj.source)
+                                futures.append((item, pool.submit(self._render, file_name, obj.source, item["mesh"])))
+                            else:
+                                item["mesh"] = os.path.join(os.path.dirname(file_name), obj.source)
+
+                for item, future in futures:
+                    try:
+                        result = future.result()
+                        item["cached"] = result is None
+                        if result is not None:
+                            item["wall_time"] = round(result.wall_time, 3)
+                            item["peak_rss"] = result.peak_rss
+                    except (RenderError, OSError) as e:
+                        item["error"] = str(e)
+                        del item["mesh"]
+        finally:
+            shutil.rmtree(self._scratch, ignore_errors=True)
+        return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m CuraOpenSCADPlugin.BatchConverter",
+                                     description="Render the cura-export parts of OpenSCAD files without Cura.")
+    parser.add_argument("files", nargs="+", metavar="file.scad")
+    parser.add_argument("-o", "--output", required=True, help="folder for the meshes and manifest.json")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="parallel openscad runs, 0 = number of cores")
+    parser.add_argument("--openscad", default=OpenSCADBinary.defaultCommand(), help="openscad command")
+    parser.add_argument("--cache", help="geometry cache folder, shared with other runs")
+    parser.add_argument("--cache-size", type=int, default=1024, help="size limit of the cache in MB")
+    parser.add_argument("--timeout", type=float, default=0, help="time limit per part in seconds, 0 = unlimited")
+    parser.add_argument("--server", action="store_true", help="render in long-lived worker processes")
+    parser.add_argument("--stub", action="store_true", help="render server workers write a fixed mesh, for testing")
+    parser.add_argument("--trace", help="write a Chrome trace of all renders to this file")
+    parser.add_argument("-D", dest="defines", action="append", default=[], metavar="var=val",
+                        help="passed on to openscad")
+    args = parser.parse_args(argv)
+
+    env = OpenSCADBinary.environment()
+    cache = RenderCache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+    cmd = OpenSCADBinary.resolve(args.openscad, env)
+    if args.server or args.stub:
+        renderer = RenderServer(cmd, env, args.jobs, args.cache, args.cache_size * 1024 * 1024, args.stub)
+    else:
+        renderer = Renderer(cmd, env, cache)
+    flags = [flag for define in args.defines for flag in ('-D', define)]
+    converter = BatchConverter(os.path.abspath(args.output), renderer, args.jobs, args.timeout or None, flags,
+                               bool(args.cache))
+
+    os.makedirs(args.output, exist_ok=True)
+    try:
+        manifest = converter.convert(args.files)
+    finally:
+        if isinstance(renderer, RenderServer):
+            renderer.stop()
+    with open(os.path.join(args.output, "manifest.json"), 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+    if args.trace:
+        Instrumentation.writeTrace(args.trace)
+
+    failed = [item for entry in manifest["files"] for group in entry["groups"] for item in group["parts"]
+              if "error" in item] + \
+             [group for entry in manifest["files"] for group in entry["groups"] if "error" in group] + \
+             [entry for entry in manifest["files"] if "error" in entry]
+    for item in failed:
+        sys.stderr.write("{0}: {1}\n".format(item.get("source", item.get("file", item.get("index"))), item["error"]))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,10 @@
+import os
+import importlib
+import importlib.util
+import threading
+
 from .lex import lex
-from .yacc import yacc
+from .yacc import yacc, ParserReflect, NullLogger
 
 from collections import namedtuple
 
@@ -63,14 +68,75 @@ class CommentParser(object):
     t_LIST = r'\[[^\]]*\]'
     t_ignore = " \n\t\r\v\f"
 
+    # Lexer and parser tables: parser_CommentParser_lextab/_parsetab are shipped with the plugin,
+    # if the grammar changes they are built once and kept in table_directory (e.g. Cura's cache).
+    # Regenerate the shipped tables by setting table_directory to the plugin folder and
+    # removing the old ones.
+    table_directory = None
+    _tables = None
+    _tables_lock = threading.Lock()
+
     def __init__(self, reader):
         self.reader = reader
 
-        self.lexer = lex(module=self)
-
         modname = "parser" + "_" + self.__class__.__name__
+        lextab = modname + "_" + "lextab"
         tabmodule = modname + "_" + "parsetab"
-        self.parser = yacc(module=self, tabmodule=tabmodule, debug=False)
+
+        tables = self._loadTables(lextab, tabmodule)
+        if tables:
+            self.lexer = lex(module=self, optimize=True, lextab=tables[0])
+            self.parser = yacc(module=self, tabmodule=tables[1], optimize=True, debug=False)
+            return
+
+        directory = self.table_directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # without a directory the tables are built in memory only, nothing is written
+        self.lexer = lex(module=self, optimize=bool(directory), lextab=lextab, outputdir=directory)
+        self.parser = yacc(module=self, tabmodule=tabmodule, outputdir=directory,
+                           write_tables=bool(directory), debug=False)
+        if directory:
+            # load the tables just written for the next instance
+            with self._tables_lock:
+                type(self)._tables = None
+
+    def _signature(self):
+        pinfo = ParserReflect({k: getattr(self, k) for k in dir(self)}, log=NullLogger())
+        pinfo.get_all()
+        return pinfo.signature()
+
+    @staticmethod
+    def _loadTable(name, directory):
+        try:
+            if directory is None:
+                return importlib.import_module("." + name, __package__)
+            path = os.path.join(directory, name + ".py")
+            if not os.path.isfile(path):
+                return None
+            spec = importlib.util.spec_from_file_location(name, path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            return module
+        except (ImportError, SyntaxError):
+            return None
+
+    def _loadTables(self, lextab, tabmodule):
+        # (lextab, parsetab) modules for the current grammar, checked once per process,
+        # tables in table_directory are newer than the shipped ones
+        cls = type(self)
+        with cls._tables_lock:
+            if cls._tables is None:
+                cls._tables = ()
+                signature = self._signature()
+                directories = [cls.table_directory] if cls.table_directory else []
+                for directory in directories + [None]:
+                    lex_module = self._loadTable(lextab, directory)
+                    yacc_module = self._loadTable(tabmodule, directory)
+                    if lex_module and yacc_module and getattr(yacc_module, "_lr_signature", None) == signature:
+                        cls._tables = (lex_module, yacc_module)
+                        break
+            return cls._tables
 
     def read(self, text):
         self.parse_write = False
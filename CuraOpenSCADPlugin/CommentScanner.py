@@ -0,0 +1,37 @@
+# Single pass scanner for /*cura-...*/ comments in .scad files. Line comments, other block
+# comments and string literals are skipped as a whole, so '/*cura-' inside of them is ignored.
+
+# built-ins
+import os
+import re
+import mmap
+from collections import namedtuple
+
+# offset, length: byte range of the whole comment, including '/*' and '*/'
+# kind: word after 'cura-', e.g. 'export' or 'profile'
+# text: comment content after the kind
+Comment = namedtuple('Comment', ['offset', 'length', 'kind', 'text'])
+
+_token = re.compile(rb'//[^\n]*|/\*(.*?)(?:\*/|\Z)|"(?:\\.|[^"\\])*(?:"|\Z)', re.S)
+_kind = re.compile(rb'cura-([A-Za-z_]*)')
+
+
+def scan(data):
+    # yields a Comment for every cura comment in data (bytes, mmap, ...)
+    for match in _token.finditer(data):
+        if data[match.start():match.start() + 7] != b'/*cura-' or data[match.end() - 2:match.end()] != b'*/':
+            # not a cura comment or not terminated
+            continue
+        kind = _kind.match(data, match.start() + 2)
+        yield Comment(match.start(), match.end() - match.start(),
+                      kind.group(1).decode('ascii'),
+                      data[kind.end():match.end(1)].decode('utf-8', errors='replace'))
+
+
+def scanFile(file_name):
+    # like scan, the file is mapped into memory instead of read
+    if os.path.getsize(file_name) == 0:
+        return
+    with open(file_name, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for comment in scan(data):
+            yield comment
@@ -0,0 +1,215 @@
+# built-ins
+import os
+import re
+import sys
+import hashlib
+import threading
+from collections import namedtuple
+
+from . import CommentScanner
+
+# comments and strings, needed to find the structure of a file
+_masked = re.compile(r'//[^\n]*|/\*.*?(?:\*/|$)|"(?:\\.|[^"\\])*(?:"|$)', re.S)
+_directive = re.compile(r'\b(include|use)\s*<([^>]*)>')
+_delimiter = re.compile(r'[()\[\]{};]')
+_definition = re.compile(r'\s*(module|function)\s+([A-Za-z_$][\w$]*)\s*\(')
+_assignment = re.compile(r'\s*\$?[A-Za-z_][\w$]*\s*=(?!=)')
+_call = re.compile(r'([A-Za-z_$][\w$]*)\s*\(')
+
+# path: resolved file name
+# stamp: (mtime, size) of the file when it was scanned
+# digest: sha256 of the content without cura comments, which the plugin writes back itself
+# dependencies: resolved include <> and use <> files, in file order
+# definitions: {module/function name: (digest, set of called names)}
+# globals: digest of all top level assignments
+SourceFile = namedtuple('SourceFile', ['path', 'stamp', 'digest', 'dependencies', 'definitions', 'globals'])
+
+
+def libraryPaths():
+    # folders OpenSCAD searches for include <> and use <>, see OpenSCAD manual 'Libraries'
+    paths = [p for p in os.environ.get('OPENSCADPATH', '').split(os.pathsep) if p]
+    home = os.path.expanduser('~')
+    if sys.platform == 'win32':
+        paths.append(os.path.join(home, 'Documents', 'OpenSCAD', 'libraries'))
+    elif sys.platform == 'darwin':
+        paths.append(os.path.join(home, 'Documents', 'OpenSCAD', 'libraries'))
+    else:
+        paths.append(os.path.join(os.environ.get('XDG_DATA_HOME', os.path.join(home, '.local', 'share')),
+                                  'OpenSCAD', 'libraries'))
+    return paths
+
+
+def resolve(name, directory, library_paths):
+    for base in [directory] + list(library_paths):
+        path = os.path.join(base, name)
+        if os.path.isfile(path):
+            return os.path.abspath(path)
+    return None
+
+
+def _mask(text, strings=True):
+    # blank out comments and the content of strings, offsets stay the same
+    def _blank(match):
+        s = match.group(0)
+        if s.startswith('"'):
+            if not strings:
+                return s
+            return '"' + ' ' * (len(s) - 2) + s[-1:] if len(s) > 1 else s
+        return re.sub(r'[^\n]', ' ', s)
+    return _masked.sub(_blank, text)
+
+
+def _statements(masked):
+    # (start, end) of every top level statement
+    start = 0
+    depth = 0
+    for match in _delimiter.finditer(masked):
+        c = match.group(0)
+        if c in '([{':
+            depth += 1
+        elif c in ')]}':
+            depth = max(0, depth - 1)
+            if c == '}' and depth == 0:
+                yield start, match.end()
+                start = match.end()
+        elif depth == 0:
+            yield start, match.end()
+            start = match.end()
+    if masked[start:].strip():
+        yield start, len(masked)
+
+
+def _digest(text):
+    # whitespace does not change the result of a render
+    return hashlib.sha256(' '.join(text.split()).encode()).hexdigest()
+
+
+def _contentDigest(content):
+    # a cura comment counts as the whitespace it is for openscad
+    digest = hashlib.sha256()
+    position = 0
+    for comment in CommentScanner.scan(content):
+        digest.update(content[position:comment.offset])
+        digest.update(b' ')
+        position = comment.offset + comment.length
+    digest.update(content[position:])
+    return digest.hexdigest()
+
+
+def calls(masked):
+    return set(match.group(1) for match in _call.finditer(masked))
+
+
+def scan(path, library_paths):
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        content = f.read()
+    text = content.decode('utf-8', errors='replace')
+    masked = _mask(text)
+    # what the statements are digested from, comments in front of or inside of them do not change a render
+    code = _mask(text, strings=False)
+
+    dependencies = []
+    for match in _directive.finditer(masked):
+        dependency = resolve(text[match.start(2):match.end(2)], os.path.dirname(path), library_paths)
+        if dependency and dependency not in dependencies:
+            dependencies.append(dependency)
+    masked = _directive.sub(lambda m: ' ' * len(m.group(0)), masked)
+
+    definitions = {}
+    assignments = []
+    for start, end in _statements(masked):
+        statement = masked[start:end]
+        definition = _definition.match(statement)
+        if definition:
+            definitions[definition.group(2)] = (_digest(code[start:end]), calls(statement[definition.end():]))
+        elif _assignment.match(statement):
+            assignments.append(code[start:end])
+
+    return SourceFile(os.path.abspath(path), (stat.st_mtime_ns, stat.st_size), _contentDigest(content),
+                      dependencies, definitions, _digest('\n'.join(assignments)))
+
+
+class DependencyGraph(object):
+    # include/use graph of .scad files with a digest per file and per module/function
+
+    def __init__(self, library_paths=None):
+        self.library_paths = libraryPaths() if library_paths is None else library_paths
+        self.files = {}
+        self._lock = threading.Lock()
+
+    def _file(self, path):
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        known = self.files.get(path)
+        if known and known.stamp == (stat.st_mtime_ns, stat.st_size):
+            return known
+        source = scan(path, self.library_paths)
+        self.files[path] = source
+        return source
+
+    def closure(self, path):
+        # path and every file reachable from it, in include order
+        with self._lock:
+            result = []
+            pending = [os.path.abspath(path)]
+            while pending:
+                current = pending.pop(0)
+                if current in result:
+                    continue
+                source = self._file(current)
+                if source is None:
+                    continue
+                result.append(current)
+                pending.extend(source.dependencies)
+            return result
+
+    def changed(self):
+        # files whose content differs from the stored digest, the graph is updated
+        with self._lock:
+            result = []
+            for path, known in list(self.files.items()):
+                if not os.path.isfile(path):
+                    del self.files[path]
+                    result.append(path)
+                    continue
+                source = self._file(path)
+                if source.digest != known.digest:
+                    result.append(path)
+            return result
+
+    def fingerprint(self, file_name, source):
+        # digest of everything the render of '!source; include <file_name>;' depends on:
+        # the expression, every module/function it reaches and the top level assignments
+        files = self.closure(file_name)
+        with self._lock:
+            definitions = {}
+            digest = hashlib.sha256(_digest(source).encode())
+            for path in files:
+                known = self.files[path]
+                digest.update(known.globals.encode())
+                for name, definition in known.definitions.items():
+                    definitions.setdefault(name, []).append(definition)
+
+        reached = set()
+        pending = list(calls(_mask(source)))
+        while pending:
+            name = pending.pop()
+            if name in reached or name not in definitions:
+                continue
+            reached.add(name)
+            for _, called in definitions[name]:
+                pending.extend(called)
+
+        for name in sorted(reached):
+            for definition_digest, _ in definitions[name]:
+                digest.update('{0}:{1}'.format(name, definition_digest).encode())
+        return digest.hexdigest()
+
+    def stale(self, file_name, fingerprints):
+        # parts of fingerprints {obj: fingerprint} that would render differently now
+        return [obj for obj, fingerprint in fingerprints.items()
+                if self.fingerprint(file_name, obj.source) != fingerprint]
@@ -0,0 +1,63 @@
+# built-ins
+import os
+import threading
+
+
+def _stamp(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+class FileWatcher(object):
+    # polls groups of files and calls callback(key) from the watcher thread once a group changed,
+    # a change is reported after the files stayed the same for one more interval (editors save in steps)
+
+    def __init__(self, callback, interval=1.0):
+        self.callback = callback
+        self.interval = interval
+        self._watched = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def watch(self, key, paths):
+        with self._lock:
+            self._watched[key] = {path: _stamp(path) for path in paths}
+            self._pending.discard(key)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="OpenSCADFileWatcher", daemon=True)
+                self._thread.start()
+
+    def unwatch(self, key):
+        with self._lock:
+            self._watched.pop(key, None)
+            self._pending.discard(key)
+
+    def stop(self):
+        self._stop.set()
+
+    def _poll(self):
+        changed = []
+        with self._lock:
+            for key, stamps in self._watched.items():
+                current = {path: _stamp(path) for path in stamps}
+                if current != stamps:
+                    stamps.update(current)
+                    self._pending.add(key)
+                elif key in self._pending:
+                    self._pending.discard(key)
+                    changed.append(key)
+        return changed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for key in self._poll():
+                try:
+                    self.callback(key)
+                except Exception:
+                    # a failing callback must not end watching
+                    pass
@@ -0,0 +1,91 @@
+# Finds parts that only differ by a rigid transformation or render to the same geometry
+
+# built-ins
+import re
+import math
+import hashlib
+
+import numpy
+
+# translate(v=...) and rotate(a=...), rotate(v=...) is a rotation around an axis and not split off
+_transform = re.compile(r'\s*(?:(translate)\s*\(\s*(?:v\s*=\s*)?|(rotate)\s*\(\s*(?:a\s*=\s*)?)\[([^\[\]]*)\]\s*\)')
+
+# openscad (x, y, z) -> Cura (x, z, -y), see MeshLoader.toCura
+_to_cura = numpy.array([[1, 0, 0, 0],
+                        [0, 0, 1, 0],
+                        [0, -1, 0, 0],
+                        [0, 0, 0, 1]], dtype=numpy.float64)
+
+
+def splitRigidTransform(source):
+    # 'translate([10, 0, 0]) rotate([0, 0, 90]) part()' -> ('part()', [('translate', (10, 0, 0)), ('rotate', (0, 0, 90))])
+    # only literal vectors are understood, anything else stays part of the expression
+    transforms = []
+    rest = source
+    while True:
+        match = _transform.match(rest)
+        if not match:
+            break
+        try:
+            values = tuple(float(v) for v in match.group(3).split(','))
+        except ValueError:
+            break
+        if len(values) != 3:
+            break
+        transforms.append((match.group(1) or match.group(2), values))
+        rest = rest[match.end():]
+
+    core = rest.strip()
+    if not transforms or not core or core.startswith('{'):
+        # nothing to split or the transformation applies to a block of children
+        return source.strip(), []
+    return core, transforms
+
+
+def _rotation(angles):
+    # rotate([a, b, c]) rotates around x, then y, then z
+    matrix = numpy.identity(4)
+    for axis, angle in enumerate(angles):
+        c, s = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+        i, j = [k for k in range(3) if k != axis]
+        rotation = numpy.identity(4)
+        rotation[i, i], rotation[i, j], rotation[j, i], rotation[j, j] = c, -s, s, c
+        if axis == 1:
+            # around y the sign is the other way round
+            rotation[i, j], rotation[j, i] = s, -s
+        matrix = rotation.dot(matrix)
+    return matrix
+
+
+def transformMatrix(transforms):
+    # 4x4 matrix in Cura coordinates of a list of transforms returned by splitRigidTransform
+    matrix = numpy.identity(4)
+    for kind, values in reversed(transforms):
+        if kind == 'translate':
+            step = numpy.identity(4)
+            step[0:3, 3] = values
+        else:
+            step = _rotation(values)
+        matrix = step.dot(matrix)
+    return _to_cura.dot(matrix).dot(_to_cura.T)
+
+
+def sameTransformation(a, b):
+    # matrices from transformMatrix, None is the identity
+    a = numpy.identity(4) if a is None else a
+    b = numpy.identity(4) if b is None else b
+    return numpy.allclose(a, b)
+
+
+def relativeTransformation(old, new):
+    # matrix that takes a mesh placed by old to the placement of new, None is the identity
+    old = numpy.identity(4) if old is None else old
+    new = numpy.identity(4) if new is None else new
+    return numpy.linalg.inv(old).dot(new)
+
+
+def meshDigest(vertices, indices=None):
+    digest = hashlib.sha1(numpy.ascontiguousarray(vertices).data)
+    if indices is not None:
+        digest.update(numpy.ascontiguousarray(indices).data)
+    return digest.hexdigest()
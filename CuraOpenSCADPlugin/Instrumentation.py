@@ -0,0 +1,115 @@
+# Timings of the reader stages and counters, for the whole process and per file,
+# readable as stats() and writable as a Chrome trace (chrome://tracing, Perfetto)
+#
+#   with span("mesh load", file_name, part=source):
+#       ...
+#   count("cache hit", file=file_name)
+#   add("openscad", file_name, start, wall_time, cpu_time=...)
+
+# built-ins
+import os
+import json
+import time
+import uuid
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# stages
+SCAN = "comment scan"
+PARSE = "parse"
+WRAPPER = "wrapper write"
+OPENSCAD = "openscad"
+MESH_LOAD = "mesh load"
+NODES = "node construction"
+WRITE_BACK = "write back"
+
+_lock = threading.Lock()
+_origin = time.perf_counter()
+# trace events, the oldest are dropped first
+_events = deque(maxlen=100000)
+# {stage: [count, total, min, max]}
+_stages = {}
+# {name: value}, {file: {name: value}}
+_counters = {}
+_files = {}
+
+
+def now():
+    # seconds since the process started measuring, the time base of add()
+    return time.perf_counter() - _origin
+
+
+def add(stage, file=None, start=None, duration=0.0, **args):
+    # a finished stage that took duration seconds from start, see now()
+    start = now() - duration if start is None else start
+    with _lock:
+        entry = _stages.get(stage)
+        if entry is None:
+            _stages[stage] = [1, duration, duration, duration]
+        else:
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] = min(entry[2], duration)
+            entry[3] = max(entry[3], duration)
+        if file is not None:
+            args["file"] = file
+        _events.append({"name": stage, "cat": "openscad", "ph": "X",
+                        "ts": round(start * 1e6), "dur": round(duration * 1e6),
+                        "pid": os.getpid(), "tid": threading.get_ident(), "args": args})
+
+
+@contextmanager
+def span(stage, file=None, **args):
+    start = now()
+    try:
+        yield args
+    finally:
+        # args can be extended inside of the block, e.g. with the size of what was read
+        add(stage, file, start, now() - start, **args)
+
+
+def count(name, value=1, file=None):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+        if file is not None:
+            counters = _files.setdefault(file, {})
+            counters[name] = counters.get(name, 0) + value
+
+
+def _ratio(counters):
+    hits = counters.get("cache hit", 0)
+    total = hits + counters.get("cache miss", 0)
+    return hits / total if total else None
+
+
+def stats():
+    # {"stages": {stage: {count, total, mean, min, max}}, "counters": {...}, "cache_hit_ratio": float or None,
+    #  "files": {file: {"counters": {...}, "cache_hit_ratio": ...}}}
+    with _lock:
+        stages = {stage: {"count": c, "total": total, "mean": total / c, "min": low, "max": high}
+                  for stage, (c, total, low, high) in _stages.items()}
+        counters = dict(_counters)
+        files = {file: {"counters": dict(values), "cache_hit_ratio": _ratio(values)}
+                 for file, values in _files.items()}
+    return {"stages": stages, "counters": counters, "cache_hit_ratio": _ratio(counters), "files": files}
+
+
+def trace():
+    with _lock:
+        return {"traceEvents": list(_events), "displayTimeUnit": "ms"}
+
+
+def writeTrace(file_name):
+    tmp = "{0}.{1}.tmp".format(file_name, uuid.uuid4())
+    with open(tmp, 'w') as f:
+        json.dump(trace(), f)
+    os.replace(tmp, file_name)
+
+
+def reset():
+    with _lock:
+        _events.clear()
+        _stages.clear()
+        _counters.clear()
+        _files.clear()
@@ -0,0 +1,120 @@
+# Loads the meshes written by openscad (binary/ASCII STL, OFF) straight into numpy arrays
+
+# built-ins
+import os
+import re
+
+import numpy
+
+_binary_facet = numpy.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+_ascii_vertex = re.compile(rb'vertex([^\n]*)')
+_off_comment = re.compile(rb'#[^\n]*')
+
+
+def isBinarySTL(path):
+    size = os.path.getsize(path)
+    if size < 84:
+        return False
+    with open(path, 'rb') as f:
+        header = f.read(84)
+    count = int(numpy.frombuffer(header, dtype='<u4', count=1, offset=80)[0])
+    return size == 84 + count * _binary_facet.itemsize
+
+
+def loadBinarySTL(path):
+    # (facets, 3, 3) view on the file, nothing is copied until the caller does
+    if os.path.getsize(path) == 84:
+        return numpy.zeros((0, 3, 3), dtype=numpy.float32)
+    facets = numpy.memmap(path, dtype=_binary_facet, mode='r', offset=84)
+    return facets['vertices']
+
+
+def loadAsciiSTL(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    # numbers of all vertex lines, parsed in one go
+    coordinates = numpy.fromstring(b' '.join(_ascii_vertex.findall(data)), dtype=numpy.float32, sep=' ')
+    return coordinates.reshape(-1, 3, 3)
+
+
+def loadOFF(path):
+    # returns vertices, triangle indices, polygons are split into fans
+    with open(path, 'rb') as f:
+        data = _off_comment.sub(b'', f.read())
+    header, _, body = data.lstrip().partition(b'\n')
+    header = header.split()
+    if header[0].endswith(b'OFF') and len(header) > 1:
+        # counts on the same line as 'OFF'
+        counts = header[1:4]
+    else:
+        body_lines = body.lstrip().split(b'\n', 1)
+        counts = body_lines[0].split()
+        body = body_lines[1] if len(body_lines) > 1 else b''
+    vertex_count, face_count = int(counts[0]), int(counts[1])
+
+    lines = body.split(b'\n')
+    lines = [line for line in lines if line.strip()]
+    vertices = numpy.fromstring(b' '.join(lines[:vertex_count]), dtype=numpy.float32, sep=' ').reshape(-1, 3)
+    faces = numpy.fromstring(b' '.join(lines[vertex_count:vertex_count + face_count]), dtype=numpy.int64, sep=' ')
+
+    if face_count and faces.size == 4 * face_count and numpy.all(faces[0::4] == 3):
+        # only triangles, the common case
+        return vertices, faces.reshape(-1, 4)[:, 1:].astype(numpy.int32)
+
+    # polygons or trailing colors, go face by face
+    triangles = []
+    for line in lines[vertex_count:vertex_count + face_count]:
+        values = [int(v) for v in line.split()]
+        polygon = values[1:values[0] + 1]
+        for i in range(1, len(polygon) - 1):
+            triangles.append((polygon[0], polygon[i], polygon[i + 1]))
+    return vertices, numpy.array(triangles, dtype=numpy.int32).reshape(-1, 3)
+
+
+def toCura(vertices):
+    # openscad is z-up, Cura y-up: (x, y, z) -> (x, z, -y), returns a new array
+    result = numpy.empty(vertices.shape, dtype=numpy.float32)
+    result[..., 0] = vertices[..., 0]
+    result[..., 1] = vertices[..., 2]
+    result[..., 2] = -vertices[..., 1]
+    return result
+
+
+def calculateNormals(vertices, indices=None):
+    # face normals, one per vertex for unindexed meshes
+    if indices is None:
+        triangles = vertices.reshape(-1, 3, 3)
+    else:
+        triangles = vertices[indices]
+    normals = numpy.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = numpy.linalg.norm(normals, axis=1)
+    lengths[lengths == 0] = 1
+    normals /= lengths[:, numpy.newaxis]
+    if indices is None:
+        return numpy.repeat(normals, 3, axis=0).astype(numpy.float32)
+
+    # indexed meshes share vertices, sum up the normals of all faces around them
+    vertex_normals = numpy.zeros(vertices.shape, dtype=numpy.float32)
+    for corner in range(3):
+        numpy.add.at(vertex_normals, indices[:, corner], normals)
+    lengths = numpy.linalg.norm(vertex_normals, axis=1)
+    lengths[lengths == 0] = 1
+    return (vertex_normals / lengths[:, numpy.newaxis]).astype(numpy.float32)
+
+
+def loadRaw(path):
+    # (vertices, indices) in openscad coordinates, for STL indices is None and
+    # vertices is a (facets, 3, 3) array, possibly a view on the file
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.off':
+        return loadOFF(path)
+    if isBinarySTL(path):
+        return loadBinarySTL(path), None
+    return loadAsciiSTL(path), None
+
+
+def load(path):
+    # (vertices, normals, indices) in Cura coordinates, vertices is the only copy of the file content
+    vertices, indices = loadRaw(path)
+    vertices = toCura(vertices).reshape(-1, 3)
+    return vertices, calculateNormals(vertices, indices), indices
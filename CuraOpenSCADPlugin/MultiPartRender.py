@@ -0,0 +1,59 @@
+# Renders several parts with a single openscad run: every part is moved to its own slot
+# of a grid, the result is split back into parts by slot afterwards
+
+# built-ins
+import math
+
+import numpy
+
+
+def _columns(count):
+    return max(1, int(math.ceil(math.sqrt(count))))
+
+
+def offset(index, count, spacing):
+    # (x, y) of the slot of part index, a grid keeps coordinates small (STL uses float32)
+    columns = _columns(count)
+    return (index % columns) * spacing, (index // columns) * spacing
+
+
+def wrapperSource(sources, file_name, spacing):
+    lines = ['!union() {']
+    for index, source in enumerate(sources):
+        x, y = offset(index, len(sources), spacing)
+        lines.append('  translate([{0}, {1}, 0]) {2};'.format(x, y, source))
+    lines.append('}')
+    lines.append('include <{0}>;'.format(file_name))
+    return '\n'.join(lines) + '\n'
+
+
+def split(vertices, indices, count, spacing):
+    # list of (facets, 3, 3) arrays in openscad coordinates, one per part and moved back to its origin,
+    # None if a facet is not completely inside one slot or a slot is empty.
+    # A facet belongs to the slot nearest to it: geometry more than spacing/2 from the origin of its part
+    # ends up in a neighbouring slot, which is only noticed when that leaves a slot empty
+    triangles = vertices[indices] if indices is not None else vertices.reshape(-1, 3, 3)
+    columns = _columns(count)
+    slot_x = numpy.floor(triangles[..., 0] / spacing + 0.5).astype(numpy.int64)
+    slot_y = numpy.floor(triangles[..., 1] / spacing + 0.5).astype(numpy.int64)
+    if numpy.any(slot_x < 0) or numpy.any(slot_x >= columns) or numpy.any(slot_y < 0):
+        return None
+    slots = slot_y * columns + slot_x
+    if numpy.any(slots != slots[:, :1]) or numpy.any(slots >= count):
+        return None
+
+    slots = slots[:, 0]
+    order = numpy.argsort(slots, kind='stable')
+    counts = numpy.bincount(slots, minlength=count)
+    if numpy.any(counts == 0):
+        # a part without geometry or one that moved into a neighbouring slot
+        return None
+    bounds = numpy.cumsum(counts)[:-1]
+    parts = []
+    for index, part in enumerate(numpy.split(triangles[order], bounds)):
+        x, y = offset(index, count, spacing)
+        part = part.astype(numpy.float32)
+        part[..., 0] -= x
+        part[..., 1] -= y
+        parts.append(part)
+    return parts
@@ -0,0 +1,68 @@
+# built-ins
+import os
+import re
+import shutil
+import platform
+import subprocess
+import threading
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def defaultCommand():
+    # Use the appropriate command for the current OS
+    if platform.system() == 'Darwin':
+        return '/Applications/OpenSCAD.app/Contents/MacOS/OpenSCAD'
+    return 'openscad'
+
+
+def environment(additional_paths=None):
+    env = os.environ.copy()
+    if additional_paths:
+        env["PATH"] = os.pathsep.join(additional_paths) + os.pathsep + env.get("PATH", "")
+    return env
+
+
+def probeVersion(cmd, env=None):
+    # version string as reported by 'openscad --version', e.g. '2021.01', '' if unknown
+    with _versions_lock:
+        if cmd in _versions:
+            return _versions[cmd]
+    version = ''
+    try:
+        out = subprocess.run([cmd, '--version'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                             env=env, timeout=30)
+        match = re.search(r'version\s+(\S+)', out.stdout.decode(errors='replace'))
+        if match:
+            version = match.group(1)
+    except (OSError, subprocess.SubprocessError):
+        pass
+    with _versions_lock:
+        _versions[cmd] = version
+    return version
+
+
+def parseVersion(version):
+    # '2021.01' -> (2021, 1), unknown parts are dropped
+    numbers = []
+    for part in version.split('.'):
+        digits = ''.join(c for c in part if c.isdigit())
+        if not digits:
+            break
+        numbers.append(int(digits))
+    return tuple(numbers)
+
+
+def exportFormat(version):
+    # (file extension, flags) of the most compact mesh format the installed openscad writes
+    # and Cura reads, binary STL since 2021.01, ASCII STL before
+    if parseVersion(version) >= (2021, 1):
+        return 'stl', ['--export-format', 'binstl']
+    return 'stl', []
+
+
+def resolve(cmd, env=None):
+    # full path of cmd using the PATH of env, the child's PATH is not searched on all platforms
+    path = env.get("PATH") if env else None
+    return shutil.which(cmd, path=path) or cmd
@@ -2,50 +2,86 @@ from UM.Scene.SceneNodeDecorator import SceneNodeDecorator
 from UM.Application import Application
 from UM.Logger import Logger
 from cura.Settings.ExtruderManager import ExtruderManager
-from collections import namedtuple
-
-Index = namedtuple('Index', ['file_name', 'group', 'obj'])
 
 class OpenSCADDecorator(SceneNodeDecorator):
     non_printing_mesh = ("infill_mesh", "cutting_mesh", "support_mesh", "anti_overhang_mesh")
 
-    def __init__(self, file_name, obj):
+    def __init__(self, file_name, obj, transformation=None):
         super(OpenSCADDecorator, self).__init__()
         self.file_name = file_name
         self.obj = obj
+        # matrix of the part of obj.source the node got as its transformation on import instead of
+        # in the mesh, None if it has none, see Instancing
+        self.transformation = transformation
+        # per-model settings stack and its user container that _settings was read from
+        self._stack = None
+        self._container = None
+        # (settings, skip_extruder) of the stack, None until read again after a change
+        self._settings = None
+        # bumped on every change of the settings, (key, text) of the last save
+        self._version = 0
+        self._saved = None
+
+    def _track(self, stack):
+        # follows the per-model settings stack of the node, the cached settings are dropped on every change
+        container = stack.getContainer(0) if stack else None
+        if stack is self._stack and container is self._container:
+            return
+        if self._stack:
+            self._stack.propertyChanged.disconnect(self._settingsChanged)
+            self._stack.containersChanged.disconnect(self._settingsChanged)
+        if self._container:
+            self._container.propertyChanged.disconnect(self._settingsChanged)
+        self._stack = stack
+        self._container = container
+        if stack:
+            stack.propertyChanged.connect(self._settingsChanged)
+            stack.containersChanged.connect(self._settingsChanged)
+        if container:
+            # the stack collects property changes and emits them later, the container right away
+            container.propertyChanged.connect(self._settingsChanged)
+        self._settingsChanged()
+
+    def _settingsChanged(self, *args):
+        self._settings = None
+        self._version += 1
 
     def getOverwrites(self):
         node = self.getNode()
 
-        settings = {}
-        skip_extruder = False
-        if node.hasDecoration('getStack'):
-            stack = node.callDecoration('getStack')
-            for key in stack.getContainer(0).getAllKeys():
-                settings[key] = stack.getProperty(key, 'value')
-                skip_extruder = skip_extruder or key in self.non_printing_mesh
+        stack = node.callDecoration('getStack') if node.hasDecoration('getStack') else None
+        self._track(stack)
+        if self._settings is None:
+            settings = {}
+            skip_extruder = False
+            if stack:
+                for key in stack.getContainer(0).getAllKeys():
+                    settings[key] = stack.getProperty(key, 'value')
+                    skip_extruder = skip_extruder or key in self.non_printing_mesh
+            self._settings = (settings, skip_extruder)
 
+        settings, skip_extruder = self._settings
+        settings = dict(settings)
         if not skip_extruder and node.hasDecoration('getActiveExtruder'):
             extruder_stack = node.callDecoration('getActiveExtruder')
             settings['extruder'] = extruder_stack
 
         return settings
 
-    def items(self):
-        node = self.getNode()
-        topGroup = node
-        while node:
-            if node.hasDecoration('isGroup'):
-                topGroup = node
-            node = node.getParent()
-        return {Index(self.file_name, topGroup, self.obj): self.getOverwrites()}
-
     def save(self):
+        overwrites = self.getOverwrites()
+        # only parts whose settings, extruder or expression changed are formatted again
+        key = (self._version, tuple(self.obj), overwrites.get('extruder'))
+        if self._saved is None or self._saved[0] != key:
+            self._saved = (key, self._format(overwrites))
+        return self._saved[1]
+
+    def _format(self, overwrites):
         name = "" if self.obj.name == "" else " AS {0}".format(self.obj.name)
         file = "FILE " if self.obj.type == "stl" else ""
         out = "  {0}'{1}'{2}".format(file, self.obj.source, name)
         settings = []
-        for k,v in self.getOverwrites().items():
+        for k,v in overwrites.items():
             if isinstance(v, str):
                 settings.append("    {0} = '{1}'".format(k,v))
             else:
@@ -56,4 +92,4 @@ class OpenSCADDecorator(SceneNodeDecorator):
         return out
 
     def __deepcopy__(self, memo):
-        return OpenSCADDecorator(self.file_name, self.obj)
+        return OpenSCADDecorator(self.file_name, self.obj, self.transformation)
@@ -0,0 +1,121 @@
+# Supervised openscad runs: timeouts, cancellation, kill of the whole process tree,
+# exit code, stderr, wall time and peak memory of every run
+
+# built-ins
+import os
+import sys
+import time
+import signal
+import tempfile
+import subprocess
+from collections import namedtuple
+
+# peak_rss in bytes, cpu_time (user + system) in seconds, None where the platform does not tell
+RenderResult = namedtuple('RenderResult', ['returncode', 'stderr', 'wall_time', 'peak_rss', 'timed_out', 'cancelled',
+                                           'cpu_time'])
+RenderResult.__new__.__defaults__ = (None,)
+
+
+class RenderError(Exception):
+    def __init__(self, message, result=None):
+        super(RenderError, self).__init__(message)
+        self.result = result
+
+
+def _exitcode(status):
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _windowsPeakRSS(process):
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD),
+                    ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t),
+                    ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t),
+                    ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    try:
+        if ctypes.windll.psapi.GetProcessMemoryInfo(int(process._handle), ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    except (AttributeError, OSError):
+        pass
+    return None
+
+
+def _poll(process):
+    # (returncode, peak_rss, cpu_time) once the process ended, (None, None, None) while it runs
+    if hasattr(os, 'wait4'):
+        pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+        if pid == 0:
+            return None, None, None
+        # reaped here, Popen must not wait for it again
+        process.returncode = _exitcode(status)
+        # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+        peak = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+        return process.returncode, peak, usage.ru_utime + usage.ru_stime
+    returncode = process.poll()
+    if returncode is None:
+        return None, None, None
+    return returncode, _windowsPeakRSS(process) if sys.platform == 'win32' else None, None
+
+
+def killTree(process):
+    # openscad runs in its own process group/session, take everything it started with it
+    try:
+        if sys.platform == 'win32':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def run(cmd, cwd=None, env=None, timeout=None, cancel=None, poll_interval=0.05):
+    # runs cmd until it ends, timeout (seconds) passes or the cancel event is set
+    if sys.platform == 'win32':
+        group = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        group = {'start_new_session': True}
+
+    start = time.monotonic()
+    timed_out = cancelled = False
+    with tempfile.TemporaryFile() as stderr:
+        # a file instead of a pipe, openscad can be very chatty and a full pipe blocks it
+        process = subprocess.Popen(cmd, cwd=cwd, env=env, stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.DEVNULL, stderr=stderr, **group)
+        while True:
+            returncode, peak_rss, cpu_time = _poll(process)
+            if returncode is not None:
+                break
+            if cancel is not None and cancel.is_set():
+                cancelled = True
+            elif timeout is not None and time.monotonic() - start > timeout:
+                timed_out = True
+            if cancelled or timed_out:
+                killTree(process)
+                while returncode is None:
+                    time.sleep(poll_interval)
+                    returncode, peak_rss, cpu_time = _poll(process)
+                break
+            if cancel is not None:
+                cancel.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+        wall_time = time.monotonic() - start
+        stderr.seek(0)
+        output = stderr.read().decode(errors='replace')
+
+    return RenderResult(returncode, output, wall_time, peak_rss, timed_out, cancelled, cpu_time)
@@ -2,17 +2,25 @@
 
 # built-ins
 import os
-import tempfile
+import time
+import shutil
 import uuid
-import platform
+import threading
+from contextlib import contextmanager
 
 # Uranium
 from UM.Application import Application  # @UnresolvedImport
 from UM.Logger import Logger  # @UnresolvedImport
+from UM.Message import Message  # @UnresolvedImport
 from UM.i18n import i18nCatalog  # @UnresolvedImport
 from UM.Version import Version  # @UnresolvedImport
+from UM.Mesh.MeshData import MeshData  # @UnresolvedImport
 from UM.Mesh.MeshReader import MeshReader  # @UnresolvedImport
+from UM.Math.Matrix import Matrix  # @UnresolvedImport
 from UM.Scene.GroupDecorator import GroupDecorator  # @UnresolvedImport
+from UM.Scene.Iterator.DepthFirstIterator import DepthFirstIterator  # @UnresolvedImport
+from UM.Scene.Selection import Selection  # @UnresolvedImport
+from UM.Resources import Resources  # @UnresolvedImport
 from UM.Settings.SettingInstance import SettingInstance  # @UnresolvedImport
 
 # Since 3.4: Register Mimetypes:
@@ -28,7 +36,23 @@ from cura.Settings.SettingOverrideDecorator import SettingOverrideDecorator  # @
 from .CadIntegrationUtils.CommonCLIReader import CommonCLIReader  # @UnresolvedImport
 
 from .CommentParser import CommentParser
+from . import CommentScanner
 from .OpenSCADDecorator import OpenSCADDecorator
+from .RenderCache import RenderCache
+from . import MeshLoader
+from . import Instancing
+from . import MultiPartRender
+from .DependencyGraph import DependencyGraph
+from .FileWatcher import FileWatcher
+from . import OpenSCADBinary
+from .Renderer import Renderer, scratchDirectory, meshDirectory
+from . import RenderServer
+from .RenderHistory import RenderHistory, renderName
+from .RenderScheduler import RenderScheduler, physicalMemory
+from . import WriteBack
+from . import Instrumentation
+from .SceneIndex import SceneIndex, sceneItems
+from .OpenSCADProcess import RenderError
 
 i18n_catalog = i18nCatalog("OpenSCADPlugin")
 
@@ -47,35 +71,121 @@ class OpenSCADReader(CommonCLIReader):
         self._supported_extensions = [".scad".lower(),
                                       ]
         self.scanForAllPaths()
+        # reads of several files run at the same time, the scheduler below limits the openscad runs
+        self._parallel_execution_allowed = True
+        # {file_name: [ObjectDict]} between preRead and read
+        self._parts = {}
+
+        preferences = Application.getInstance().getPreferences()
+        # number of parts rendered at the same time, 0 = number of cores
+        preferences.addPreference("openscad/render_workers", 0)
+        # size limit of the geometry cache in MB, 0 = disabled
+        preferences.addPreference("openscad/cache_size", 1024)
+        # render parts with draft_fn first, then replace them with the full quality render
+        preferences.addPreference("openscad/draft_first", False)
+        preferences.addPreference("openscad/draft_fn", 12)
+        # "parallel": one openscad run per part, "single": one openscad run for all parts of a file
+        preferences.addPreference("openscad/render_mode", "parallel")
+        # distance between parts in single render mode, in mm, all geometry of a part has to be within
+        # +-spacing/2 of its origin in x and y, otherwise it can end up with a neighbouring part
+        preferences.addPreference("openscad/single_pass_spacing", 2000)
+        # time limits in seconds for rendering a single part and all parts of a file, 0 = unlimited
+        preferences.addPreference("openscad/part_timeout", 600)
+        preferences.addPreference("openscad/file_timeout", 1800)
+        # re-render changed parts when an opened file or one of its includes changes on disk
+        preferences.addPreference("openscad/watch_files", False)
+        # render in long-lived worker processes instead of the Cura process, see RenderServer
+        preferences.addPreference("openscad/render_server", False)
+        # MB all parallel renders together may use, 0 = 75% of the RAM, parts that were never rendered
+        # are expected to need unknown_part_memory MB, later the peak of their last render
+        preferences.addPreference("openscad/memory_budget", 0)
+        preferences.addPreference("openscad/unknown_part_memory", 2048)
+        # Chrome trace (chrome://tracing) of all reader stages, written after every read and write back, "" = off
+        preferences.addPreference("openscad/trace_file", "")
+
+        # include/use graph of all opened files, fingerprints {file_name: {obj: fingerprint}} of imported parts
+        self._graph = DependencyGraph()
+        self._fingerprints = {}
+        # options of the last import of each file, reused for re-rendering
+        self._options = {}
+        # {file_name: ((mtime, size), [Comment], digest)} for write back by byte range, see WriteBack,
+        # digest of the cura-export text on disk
+        self._indexes = {}
+        self._index_lock = threading.RLock()
+        # write back runs on its own thread, writes started close together are written once
+        self._writeBack = WriteBack.WriteBackQueue(self._writeFiles)
+        self._watcher = FileWatcher(self._onSourceChanged)
+        # {file_name: (read event, scene event)} of the last read of a file: the read event cancels its renders
+        # (Cancel button), the scene event the later ones (full quality, watcher) once the file is closed
+        self._cancel_events = {}
+        self._cancel_lock = threading.Lock()
+        # {scene event: (file_name, [node], placed, refine)} of reads whose nodes can still get renders,
+        # these are cancelled once the nodes were in the scene and left it, refine: {obj: node} of draft
+        # nodes to render at full quality once they are in the scene, None if there are none
+        self._imports = {}
+        self._scene_check = False
+        # number of pending full quality renders, slicing is paused while there are any
+        self._slicing_holds = 0
+
+        self._parsers = threading.local()
+        # parse tables for a changed grammar are kept next to the geometry cache
+        CommentParser.table_directory = os.path.join(Resources.getCacheStoragePath(), "openscad-tables")
+
+        self._cache = None
+        cache_size = int(preferences.getValue("openscad/cache_size") or 0)
+        if cache_size > 0:
+            self._cache = RenderCache(os.path.join(Resources.getCacheStoragePath(), "openscad"),
+                                      cache_size * 1024 * 1024, self._graph)
+        self._server = None
+        self._server_lock = threading.Lock()
+        # render times of earlier sessions decide the order of renders, see RenderScheduler
+        self._history = RenderHistory(os.path.join(self._cache.directory, "history.json") if self._cache else None)
+        self._scheduler = RenderScheduler(self._renderWorkers(), self._memoryBudget())
+        Selection.selectionChanged.connect(self._onSelectionChanged)
+        Application.getInstance().getController().getScene().sceneChanged.connect(self._onSceneChanged)
+
         Application.getInstance().getOutputDeviceManager().writeStarted.connect(self.write)
 
     def openForeignFile(self, options):
-        options["fileFormats"].append("stl")
+        # binary STL if the installed openscad can write it, see exportFileAs
+        version = OpenSCADBinary.probeVersion(self._openscadCommand(), self._environment())
+        options["fileFormats"].append(OpenSCADBinary.exportFormat(version)[0])
 
         return super().openForeignFile(options)
 
     def areReadersAvailable(self):
         return bool(self._readerForFileformat)
 
-    def parseFileComments(self, file_name, receiv):
-        with open(file_name, 'r') as inp:
-            text = inp.read()
-            blocks = text.split('/*cura-')
-            # send everything before the first block, needed during write back
-            receiv(None, blocks.pop(0))
-            for block in blocks:
-                [comment, post] = block.split('*/', 1)
-                if comment.startswith('export'):
-                    receiv(comment[6:], post)
-                    # self.parts.append(parser.read(section[6:]))
-                elif comment.startswith('profile'):
-                    # TODO: how to deal with profile changes?
-                    pass
-                else:
-                    # unknown section, send for write back
-                    receiv(None, post)
-
-        Logger.log("d", "parts: #{0} {1}".format(len(self.parts), self.parts))
+    def _fileIndex(self, file_name, rescan=False):
+        # cura comments of file_name with their byte ranges, scanned again if the (mtime, size) stamp changed
+        with self._index_lock:
+            # a write back interrupted by a crash is undone first
+            if WriteBack.recover(file_name):
+                Logger.log("w", "restored {0} after an interrupted write back".format(file_name))
+        stat = os.stat(file_name)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._index_lock:
+            index = self._indexes.get(file_name)
+            if rescan or index is None or index[0] != stamp:
+                with Instrumentation.span(Instrumentation.SCAN, file_name, bytes=stat.st_size):
+                    comments = list(CommentScanner.scanFile(file_name))
+                Instrumentation.count("bytes read", stat.st_size, file_name)
+                index = self._setIndex(file_name, comments)
+            return index[1]
+
+    def _setIndex(self, file_name, comments):
+        stat = os.stat(file_name)
+        digest = WriteBack.digest(WriteBack.blockText(c) for c in comments if c.kind == 'export')
+        with self._index_lock:
+            index = self._indexes[file_name] = ((stat.st_mtime_ns, stat.st_size), comments, digest)
+        return index
+
+    def _parser(self):
+        # one parser per thread, built on first use, the lexer keeps state while parsing
+        parser = getattr(self._parsers, "parser", None)
+        if parser is None:
+            parser = self._parsers.parser = CommentParser(self)
+        return parser
 
     def nodePostProcessing(self, options, scene_nodes):
         self.renameNodes(options, scene_nodes)
@@ -85,15 +195,19 @@ class OpenSCADReader(CommonCLIReader):
     def preRead(self, options):
         Logger.log("d", "preRead file: %s", options)
 
-        parser = CommentParser(self)
-        self.parts = []
-        def _collector(comment, post):
-            if comment:
-                self.parts.append(parser.read(comment))
-        self.parseFileComments(options, _collector)
+        self._parts[options] = parts = self._readParts(options)
+        Logger.log("d", "parts: #{0} {1}".format(len(parts), parts))
 
         return MeshReader.PreReadResult.accepted
 
+    def _readParts(self, file_name):
+        parser = self._parser()
+        comments = self._fileIndex(file_name, rescan=True)
+        with Instrumentation.span(Instrumentation.PARSE, file_name):
+            parts = [parser.read(comment.text) for comment in comments if comment.kind == 'export']
+        Instrumentation.count("parts", sum(len(part) for part in parts if part), file_name)
+        return parts
+
     def _node(self, mesh, settings):
         node = CuraSceneNode()
         node.setMeshData(mesh)
@@ -118,75 +232,519 @@ class OpenSCADReader(CommonCLIReader):
         Logger.log('d', 'node: {0}'.format(node))
         return node
 
-    def importParts(self, options):
+    def _renderWorkers(self):
+        workers = Application.getInstance().getPreferences().getValue("openscad/render_workers")
+        try:
+            workers = int(workers)
+        except (TypeError, ValueError):
+            workers = 0
+        return workers if workers > 0 else (os.cpu_count() or 1)
+
+    def _memoryBudget(self):
+        # bytes, None if unlimited
+        budget = int(Application.getInstance().getPreferences().getValue("openscad/memory_budget") or 0)
+        if budget > 0:
+            return budget * 1024 * 1024
+        memory = physicalMemory()
+        return memory * 3 // 4 if memory else None
+
+    def _updateScheduler(self):
+        # renders of all files share the workers, see RenderScheduler
+        self._scheduler.setWorkers(self._renderWorkers())
+        self._scheduler.setMemoryBudget(self._memoryBudget())
+
+    def _renderEstimate(self, wrapper, flags):
+        # (wall time or None, peak memory) of a render, from its last run
+        entry = self._history.get(renderName(wrapper, flags)) or {}
+        unknown = int(Application.getInstance().getPreferences().getValue("openscad/unknown_part_memory") or 0)
+        return entry.get("wall_time"), entry.get("peak_rss") or unknown * 1024 * 1024
+
+    def _meshData(self, vertices, indices=None, file_name=None):
+        # vertices in openscad coordinates, as returned by MeshLoader.loadRaw
+        vertices = MeshLoader.toCura(vertices).reshape(-1, 3)
+        normals = MeshLoader.calculateNormals(vertices, indices)
+        return MeshData(vertices=vertices, normals=normals, indices=indices, file_name=file_name)
+
+    @contextmanager
+    def _export(self, options, wrapper):
+        # renders the wrapper source, yields the name of the mesh file
+        # every render gets its own copy of options, exportFileAs stores its file names there
+        options = dict(options)
+        options["sourceFile"] = options["foreignFile"]
+        # wrapper and mesh are only needed until the mesh is loaded, the session's folders are removed
+        # on exit if anything is left, the small wrapper files are kept in memory where possible
+        name = uuid.uuid4()
+        options["foreignFile"] = os.path.join(scratchDirectory(), "{}.{}".format(name, "scad"))
+        options["tempFile"] = os.path.join(meshDirectory(), "{}.{}".format(name, options["fileFormats"][0]))
+        options["useCacheFile"] = True
+        options["renderName"] = renderName(wrapper, options.get("renderFlags", []))
+        # runs as a job of the scheduler already
+        options["scheduled"] = True
+        try:
+            with Instrumentation.span(Instrumentation.WRAPPER, options["sourceFile"]):
+                with open(options["foreignFile"], 'w') as f:
+                    f.write(wrapper)
+            Instrumentation.count("bytes written", len(wrapper), options["sourceFile"])
+            self.exportFileAs(options)
+            # on a cache hit the mesh is loaded from the cache directly
+            yield options.get("cacheFile", options["tempFile"])
+        finally:
+            for temp_file in (options["foreignFile"], options["tempFile"]):
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+
+    def _partWrapper(self, file_name, source):
+        return '!{0};\ninclude <{1}>;\n'.format(source, file_name)
+
+    def _loadMesh(self, mesh_file, file_name, source=None):
+        size = os.path.getsize(mesh_file)
+        with Instrumentation.span(Instrumentation.MESH_LOAD, file_name, part=source, bytes=size):
+            mesh = MeshLoader.loadRaw(mesh_file)
+        Instrumentation.count("bytes read", size, file_name)
+        return mesh
+
+    def _renderPart(self, options, file_name, source):
+        with self._export(options, self._partWrapper(file_name, source)) as mesh_file:
+            vertices, indices = self._loadMesh(mesh_file, file_name, source)
+            mesh = self._meshData(vertices, indices, mesh_file)
+            # vertices can be a view of the mapped mesh file, which is removed at the end of the block
+            del vertices
+        return mesh
+
+    def _renderSinglePass(self, options, file_name, sources):
+        # {source: mesh data} from one openscad run, None if the result can not be split into parts
+        spacing = float(Application.getInstance().getPreferences().getValue("openscad/single_pass_spacing"))
+        try:
+            with self._export(options, MultiPartRender.wrapperSource(sources, file_name, spacing)) as mesh_file:
+                vertices, indices = self._loadMesh(mesh_file, file_name)
+                parts = MultiPartRender.split(vertices, indices, len(sources), spacing)
+                del vertices
+        except RenderError as e:
+            Logger.log("w", "Single render of {0} failed: {1}".format(file_name, e))
+            cancel = options.get("cancel")
+            return {} if cancel is not None and cancel.is_set() else None
+        if parts is None:
+            Logger.log("w", "Parts of {0} can not be told apart within {1}mm, rendering them one by one".format(
+                file_name, spacing))
+            return None
+        return {source: self._meshData(part) for source, part in zip(sources, parts)}
+
+    def _renderParts(self, options, file_name, objs):
+        # {obj: (mesh data, transformation or None)}, all rendered at the same time,
+        # parts that only differ by a rigid transformation are rendered once and
+        # parts with identical geometry share the same mesh data
+        split = {obj: Instancing.splitRigidTransform(obj.source) for obj in objs}
+        sources = {}
+        for obj, (core, _) in split.items():
+            sources.setdefault(core, set()).add(obj.source)
+        cores = {}
+        transforms = {}
+        for obj in objs:
+            core, transforms[obj] = split[obj]
+            if len(sources[core]) < 2:
+                # nothing to share, the transformation stays in the geometry where
+                # resetting the model transformations in Cura does not undo it
+                core, transforms[obj] = obj.source.strip(), []
+            cores.setdefault(core, []).append(obj)
+
+        self._updateScheduler()
+        flags = options.get("renderFlags", [])
+        meshes = None
+        if len(cores) > 1 and \
+                Application.getInstance().getPreferences().getValue("openscad/render_mode") == "single":
+            spacing = float(Application.getInstance().getPreferences().getValue("openscad/single_pass_spacing"))
+            estimate, memory = self._renderEstimate(
+                MultiPartRender.wrapperSource(list(cores.keys()), file_name, spacing), flags)
+            try:
+                meshes = self._scheduler.submit(file_name, None, estimate, self._renderSinglePass,
+                                                options, file_name, list(cores.keys()), memory=memory).result()
+            except Exception:
+                Logger.logException("e", "Single render of {0} failed, rendering the parts one by one".format(file_name))
+        if meshes is None:
+            futures = {}
+            for core in cores:
+                estimate, memory = self._renderEstimate(self._partWrapper(file_name, core), flags)
+                futures[core] = self._scheduler.submit(file_name, core, estimate, self._renderPart,
+                                                       options, file_name, core, memory=memory)
+            meshes = {}
+            for core, future in futures.items():
+                try:
+                    meshes[core] = future.result()
+                except RenderError as e:
+                    # parts that did render are still loaded
+                    Logger.log("w", "Failed to render {0}: {1}".format(core, e))
+                except Exception:
+                    Logger.logException("e", "Failed to load {0}".format(core))
+        self._history.save()
+
+        unique = {}
+        rendered = {}
+        for core, mesh in meshes.items():
+            mesh = unique.setdefault(Instancing.meshDigest(mesh.getVertices(), mesh.getIndices()), mesh)
+            for obj in cores[core]:
+                rendered[obj] = (mesh, Instancing.transformMatrix(transforms[obj]) if transforms[obj] else None)
+        Logger.log("d", "rendered {0} parts, {1} renders, {2} meshes".format(len(rendered), len(cores), len(unique)))
+        return rendered
+
+    def importParts(self, options, parts):
         Logger.log("d", "importParts: {0}".format(options))
         options["tempFileKeep"] = True
         file_name = options["foreignFile"];
         active_build_plate = Application.getInstance().getMultiBuildPlateModel().activeBuildPlate
         nodes = []
-
-        for part in self.parts:
+        created = {}
+
+        # a new read of the same file stops all renders still running for it
+        with self._cancel_lock:
+            for event in self._cancel_events.get(file_name, ()):
+                event.set()
+            options["cancel"] = threading.Event()
+            scene_cancel = threading.Event()
+            self._cancel_events[file_name] = (options["cancel"], scene_cancel)
+        # re-renders after the read do not stop with a cancelled read, only when the file is closed
+        self._options[file_name] = dict(options, cancel=scene_cancel)
+
+        # render all meshes at the same time, nodes are built in file order once all are done
+        scad_meshes = [mesh for part in parts for mesh in part.keys() if mesh.type == "scad"]
+        draft = bool(Application.getInstance().getPreferences().getValue("openscad/draft_first"))
+        render_options = dict(options, renderFlags=self._draftFlags()) if draft else dict(options)
+        file_timeout = float(Application.getInstance().getPreferences().getValue("openscad/file_timeout") or 0)
+        if file_timeout > 0:
+            # shared by all renders of the file, starts with the first one, time spent waiting for
+            # the workers behind other files does not count
+            render_options["deadline"] = {"timeout": file_timeout}
+
+        message = Message(i18n_catalog.i18nc("@info:status", "Rendering {0}").format(os.path.basename(file_name)),
+                          lifetime=0, dismissable=False, progress=-1,
+                          title=i18n_catalog.i18nc("@info:title", "OpenSCAD"))
+        message.addAction("cancel", i18n_catalog.i18nc("@action:button", "Cancel"), "", "")
+        message.actionTriggered.connect(lambda _message, _action: options["cancel"].set())
+        message.show()
+        try:
+            rendered = self._renderParts(render_options, file_name, scad_meshes)
+        finally:
+            message.hide()
+        self._fingerprints[file_name] = {mesh: self._graph.fingerprint(file_name, mesh.source) for mesh in rendered}
+        # a read that was cancelled or failed as a whole has nothing to re-render
+        if rendered and Application.getInstance().getPreferences().getValue("openscad/watch_files"):
+            self._watcher.watch(file_name, self._graph.closure(file_name))
+
+        start = Instrumentation.now()
+        for part in parts:
             if len(part) > 1:
                 group = CuraSceneNode()
                 group.setSelectable(True)
                 group.addDecorator(GroupDecorator())
                 group.addDecorator(BuildPlateDecorator(active_build_plate))
-                nodes.append(group)
 
             for mesh, settings in part.items():
                 Logger.log("d", "import mesh: {0}".format(mesh))
                 if mesh.type == "scad":
-                    tempdir = tempfile.gettempdir()
-                    options["foreignFile"] = os.path.join(tempdir, "{}.{}".format(uuid.uuid4(), "scad"))
-                    try:
-                        with open(options["foreignFile"], 'w') as f:
-                            f.write('!{0};\ninclude <{1}>;\n'.format(mesh.source, file_name))
-                            f.close()
-                        node = self._node(self.readOnSingleAppLayer(options).getMeshData(), settings)
-                        node.addDecorator(BuildPlateDecorator(active_build_plate))
-                        node.addDecorator(OpenSCADDecorator(file_name, mesh))
-                        if len(part) > 1:
-                            group.addChild(node)
-                        else:
-                            nodes.append(node)
-                    finally:
-                        if not options["tempFileKeep"]:
-                            os.remove(options["foreignFile"])
+                    if mesh not in rendered:
+                        # failed, timed out or cancelled
+                        continue
+                    mesh_data, transformation = rendered[mesh]
+                    node = self._node(mesh_data, settings)
+                    if transformation is not None:
+                        node.setTransformation(Matrix(transformation))
+                    node.addDecorator(BuildPlateDecorator(active_build_plate))
+                    node.addDecorator(OpenSCADDecorator(file_name, mesh, transformation))
+                    created[mesh] = node
+                    if len(part) > 1:
+                        group.addChild(node)
+                    else:
+                        nodes.append(node)
                 else:
                     options["foreignFile"] = os.path.join(os.path.split(file_name)[0], mesh.source)
 
+            if len(part) > 1 and group.getChildren():
+                nodes.append(group)
+        Instrumentation.add(Instrumentation.NODES, file_name, start, Instrumentation.now() - start, nodes=len(created))
+        Instrumentation.count("files")
+        self._writeTrace()
+
+        if created:
+            # the full quality render starts once Uranium centred the draft meshes and they are in the scene
+            with self._cancel_lock:
+                self._imports[scene_cancel] = (file_name, list(created.values()), False, created if draft else None)
+
         return self.nodePostProcessing(options, nodes)
 
+    def _draftFlags(self):
+        # coarse resolution, overrides top level $fn/$fa/$fs of the file
+        fn = int(Application.getInstance().getPreferences().getValue("openscad/draft_fn"))
+        return ['-D', '$fn={0}'.format(fn), '-D', '$fa=12', '-D', '$fs=2']
+
+    def _holdSlicing(self, hold):
+        # slicing waits while full quality renders are pending, runs on the main thread
+        def _hold():
+            backend = Application.getInstance().getBackend()
+            self._slicing_holds += 1 if hold else -1
+            if hold and self._slicing_holds == 1:
+                backend.pauseSlicing()
+            elif not hold and self._slicing_holds == 0:
+                backend.continueSlicing()
+                backend.needsSlicing()
+                backend.tickle()
+        Application.getInstance().callLater(_hold)
+
+    def _replaceMesh(self, node, mesh, transformation=None):
+        # transformation: split off the source of the new mesh, see _renderParts. The node keeps the one it
+        # got when it was imported, the difference goes into the new mesh.
+        decorator = node.getDecorator(OpenSCADDecorator)
+        carried = decorator.transformation if decorator else None
+        if not Instancing.sameTransformation(carried, transformation):
+            mesh = mesh.getTransformed(Matrix(Instancing.relativeTransformation(carried, transformation)))
+        # Uranium moved the mesh of the imported node around its center (setCenterPosition in
+        # MeshFileHandler.readerRead), the new mesh is moved the same way so the part stays in place
+        old = node.getMeshData()
+        center = old.getCenterPosition() if old is not None else None
+        if center is not None:
+            matrix = Matrix()
+            matrix.setByTranslation(-center)
+            mesh = mesh.getTransformed(matrix).set(center_position=center)
+        node.setMeshData(mesh)
+
+    def _setMeshes(self, meshes):
+        # {node: (mesh data, transformation or None)}
+        for node, (mesh, transformation) in meshes.items():
+            self._replaceMesh(node, mesh, transformation)
+
+    def _refine(self, options, file_name, nodes):
+        # renders the draft nodes {obj: node} again at full quality in the background
+        self._holdSlicing(True)
+        def _run():
+            try:
+                rendered = self._renderParts(options, file_name, list(nodes.keys()))
+                Application.getInstance().callLater(self._setMeshes,
+                                                    {nodes[obj]: result for obj, result in rendered.items()})
+            except Exception:
+                Logger.logException("e", "Failed to render {0} at full quality".format(file_name))
+            finally:
+                self._holdSlicing(False)
+        threading.Thread(target=_run, name="OpenSCADRefine", daemon=True).start()
+
+    def promote(self, file_name, obj):
+        # renders of obj waiting in the queue are started next, rendered on its own or shared with others
+        self._scheduler.promote(file_name, obj.source.strip())
+        self._scheduler.promote(file_name, Instancing.splitRigidTransform(obj.source)[0])
+
+    def _onSelectionChanged(self):
+        for selected in Selection.getAllSelectedObjects():
+            for node in DepthFirstIterator(selected):
+                decorator = node.getDecorator(OpenSCADDecorator)
+                if decorator:
+                    self.promote(decorator.file_name, decorator.obj)
+
+    def _onSceneChanged(self, _node):
+        # checked once per event loop run, the scene changes many times while a model is moved
+        if self._imports and not self._scene_check:
+            self._scene_check = True
+            Application.getInstance().callLater(self._checkImports)
+
+    @staticmethod
+    def _inScene(node, root):
+        # removed nodes or the group around them are detached from the scene
+        while node is not None:
+            if node is root:
+                return True
+            node = node.getParent()
+        return False
+
+    def _checkImports(self):
+        # the renders of a file stop when it is closed: nodes deleted, build plate cleared or a new project
+        self._scene_check = False
+        root = Application.getInstance().getController().getScene().getRoot()
+        with self._cancel_lock:
+            for event, (file_name, nodes, placed, refine) in list(self._imports.items()):
+                if event.is_set():
+                    # replaced by a new read of the file, which watches it again
+                    del self._imports[event]
+                elif any(self._inScene(node, root) for node in nodes):
+                    if not placed:
+                        self._imports[event] = (file_name, nodes, True, None)
+                        if refine:
+                            self._refine(self._options[file_name], file_name, refine)
+                elif placed:
+                    Logger.log("d", "closed, cancelling renders: {0}".format(file_name))
+                    event.set()
+                    del self._imports[event]
+                    if self._cancel_events.get(file_name, (None, None))[1] is event:
+                        self._watcher.unwatch(file_name)
+
+    def staleParts(self, file_name):
+        # imported parts of file_name that would render differently after the last edit
+        return self._graph.stale(file_name, self._fingerprints.get(file_name, {}))
+
+    def _onSourceChanged(self, file_name):
+        # called from the watcher thread, renders affected parts and swaps them on the main thread
+        try:
+            Logger.log("d", "source changed: {0}".format(file_name))
+            self._graph.changed()
+            self._watcher.watch(file_name, self._graph.closure(file_name))
+
+            fingerprints = self._fingerprints.get(file_name, {})
+            # the expression of a part with a name might have been edited in the comment
+            current = {}
+            parser = self._parser()
+            for comment in self._fileIndex(file_name):
+                if comment.kind == 'export':
+                    for obj in parser.read(comment.text).keys():
+                        current[obj] = obj
+
+            stale = {}
+            for obj in self._graph.stale(file_name, fingerprints):
+                stale[obj] = current.get(obj, obj)
+            for obj in fingerprints:
+                if obj in current and current[obj].source != obj.source:
+                    stale[obj] = current[obj]
+            stale = {obj: new for obj, new in stale.items() if obj in current}
+            if not stale:
+                return
+
+            Logger.log("d", "re-render: {0}".format(list(stale.values())))
+            options = self._options[file_name]
+            # the nodes keep their transformation, only the mesh data is replaced
+            meshes = self._renderParts(options, file_name, list(stale.values()))
+            rendered = {obj: (new,) + meshes[new] for obj, new in stale.items() if new in meshes}
+
+            for obj, (new, _, _) in rendered.items():
+                del fingerprints[obj]
+                fingerprints[new] = self._graph.fingerprint(file_name, new.source)
+            Application.getInstance().callLater(self._swapMeshes, file_name, rendered)
+        except Exception:
+            Logger.logException("e", "Failed to re-render {0}".format(file_name))
+
+    def _swapMeshes(self, file_name, rendered):
+        # only the mesh data changes, transformation and per-model settings stay with the node
+        root = Application.getInstance().getController().getScene().getRoot()
+        for node in DepthFirstIterator(root):
+            decorator = node.getDecorator(OpenSCADDecorator)
+            if decorator and decorator.file_name == file_name and decorator.obj in rendered:
+                obj, mesh, transformation = rendered[decorator.obj]
+                decorator.obj = obj
+                self._replaceMesh(node, mesh, transformation)
+
     def read(self, file_path):
+        parts = self._parts.pop(file_path, None)
+        if parts is None:
+            parts = self._readParts(file_path)
         options = self.readCommon(file_path)
-        if self.parts == []:
-            result = self.readOnSingleAppLayer(options)
-        else:
-            result = self.importParts(options)
-
-        # Unlock if needed
-        if not self._parallel_execution_allowed:
-            self.conversion_lock.release()
+        try:
+            if parts == []:
+                result = self.readOnSingleAppLayer(options)
+            else:
+                result = self.importParts(options, parts)
+        finally:
+            # Unlock if needed, a failed render must not block further reads
+            if not self._parallel_execution_allowed:
+                self.conversion_lock.release()
 
         return result
 
+    def renderStats(self):
+        # timings of all stages and counters since Cura started, see Instrumentation.stats
+        return Instrumentation.stats()
+
+    def _writeTrace(self):
+        trace_file = Application.getInstance().getPreferences().getValue("openscad/trace_file")
+        if trace_file:
+            try:
+                Instrumentation.writeTrace(trace_file)
+            except OSError:
+                Logger.logException("w", "Could not write trace {0}".format(trace_file))
+
+    def clearCache(self):
+        if self._cache:
+            self._cache.clear()
+
+    def _environment(self):
+        return OpenSCADBinary.environment(self._additional_paths)
+
+    def _openscadCommand(self):
+        return OpenSCADBinary.resolve(OpenSCADBinary.defaultCommand(), self._environment())
+
+    def _renderer(self):
+        if not Application.getInstance().getPreferences().getValue("openscad/render_server"):
+            return Renderer(self._openscadCommand(), self._environment(), self._cache)
+        if not RenderServer.available():
+            Logger.log("w", "Render server needs a python interpreter, rendering in process")
+            return Renderer(self._openscadCommand(), self._environment(), self._cache)
+        with self._server_lock:
+            if self._server is None:
+                cache = self._cache
+                self._server = RenderServer.RenderServer(self._openscadCommand(), self._environment(),
+                                                         self._renderWorkers(),
+                                                         cache.directory if cache else None,
+                                                         cache.max_size if cache else 0)
+            return self._server
+
+    def _timeout(self, options):
+        # seconds left for a single render, None if unlimited
+        timeout = float(Application.getInstance().getPreferences().getValue("openscad/part_timeout") or 0) or None
+        deadline = options.get("deadline")
+        if deadline is not None:
+            # setdefault: only the first render of the file sets the end
+            remaining = deadline.setdefault("end", time.monotonic() + deadline["timeout"]) - time.monotonic()
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return timeout
+
     def exportFileAs(self, options, quality_enum=None):
         Logger.log("d", "Exporting file: %s", options["tempFile"])
-
-        # Use the appropriate command for the current OS
-        if platform.system() == 'Darwin':
-            cmd = '/Applications/OpenSCAD.app/Contents/MacOS/OpenSCAD'
-        else:
-            cmd = 'openscad'
-
-        cmd = [cmd, '-o', options["tempFile"], options["foreignFile"]]
-        self.executeCommand(cmd, cwd=os.path.split(options["foreignFile"])[0])
+        if options.get("scheduled"):
+            return self._exportFile(options)
+
+        # a file without cura-export comments is rendered as a whole, it waits for a worker like all parts
+        file_name = options["foreignFile"]
+        flags = options.get("renderFlags", [])
+        with open(file_name, errors='replace') as f:
+            source = f.read()
+        options["renderName"] = renderName(source, flags)
+        self._updateScheduler()
+        estimate, memory = self._renderEstimate(source, flags)
+        return self._scheduler.submit(file_name, file_name, estimate, self._exportFile, options,
+                                      memory=memory).result()
+
+    def _exportFile(self, options):
+        cancel = options.get("cancel")
+        renderer = self._renderer()
+        timeout = self._timeout(options)
+        try:
+            mesh_file, result = renderer.render(options["foreignFile"], options["tempFile"],
+                                                options.get("renderFlags", []), timeout, cancel)
+        except RenderError as e:
+            if e.result is not None:
+                options["renderResult"] = e.result
+                self._recordRender(options, e.result)
+            raise
+        source_file = options.get("sourceFile", options["foreignFile"])
+        if result is None:
+            Logger.log("d", "Cache hit: %s", mesh_file)
+            Instrumentation.count("cache hit", file=source_file)
+            if options.get("useCacheFile"):
+                options["cacheFile"] = mesh_file
+            else:
+                shutil.copyfile(mesh_file, options["tempFile"])
+            return
+
+        options["renderResult"] = result
+        if self._cache:
+            Instrumentation.count("cache miss", file=source_file)
+        self._recordRender(options, result)
+        if options.get("renderName"):
+            self._history.record(options["renderName"], result.wall_time, result.peak_rss)
+        Logger.log("d", "openscad exit code: {0} time: {1:.2f}s peak memory: {2}".format(
+            result.returncode, result.wall_time, result.peak_rss))
+
+    def _recordRender(self, options, result):
+        Instrumentation.add(Instrumentation.OPENSCAD, options.get("sourceFile", options["foreignFile"]),
+                            duration=result.wall_time, cpu_time=result.cpu_time, peak_rss=result.peak_rss,
+                            returncode=result.returncode, timed_out=result.timed_out, cancelled=result.cancelled)
+        Instrumentation.count("renders", file=options.get("sourceFile", options["foreignFile"]))
 
     def _get_scene_items(self, node):
-        items = node.callDecoration("items") if node.hasDecoration("getOverwrites") else {}
-        for child in node.getChildren():
-            items.update(self._get_scene_items(child))
-        return items
+        # one walk over the scene, the top group is passed down instead of searched for every node
+        return sceneItems(node, OpenSCADDecorator)
 
 
     def write(self, output_device):
@@ -195,55 +753,120 @@ class OpenSCADReader(CommonCLIReader):
         items = self._get_scene_items(root);
         Logger.log("d", "items:{0}".format(items))
 
-        groups = set((key.group for key in items.keys()))
+        scene = SceneIndex(items)
         # ensure that every group of parts is made from parts from the same file
-        # collect file_name for each part in a every group use set() to remove duplicates
-        unique =  {outer:set([inner.file_name for inner in items if inner.group == outer]) for outer in groups}
-        for node, files in unique.items():
-            if len(files) > 1:
-                #TODO: warning
-                return
-
-        parser = CommentParser(self)
-        files = set([k.file_name for k in items.keys()])
-        for file in files:
-            # filter all items form this file
-            self.parts = [item.obj for item in items if item.file_name == file]
-
-            tmp = os.path.join(os.path.dirname(file), '.' + os.path.basename(file))
-            with open(tmp, 'w') as out:
-                def _writer(comment, post):
-                    if comment:
-                        part = parser.read(comment)
-                        if set(part.keys()).issubset(self.parts):
-                            Logger.log("d", "found:{0}".format(part.keys()))
-                            # this might return multiple groups (after ungrouping)
-                            groups = set((key.group for key in items.keys() if key.obj in set(part.keys())))
-                            Logger.log("d", "groups:{0}".format(groups))
-
-                            for node in groups:
-                                if node.hasDecoration('isGroup'):
-                                    out.write("/*cura-export\n")
-                                    for child in node.getChildren():
-                                        if child.hasDecoration("save"):
-                                            out.write("{0}\n".format(child.callDecoration("save")))
-                                            for e in child.callDecoration("items"): self.parts.remove(e.obj)
-                                    out.write("*/")
-                                else:
-                                    out.write("/*cura-export\n{0}\n*/".format(node.callDecoration("save")))
-                                    for e in node.callDecoration("items"):
-                                        Logger.log("d", "remove:{0}".format(e.obj))
-                                        self.parts.remove(e.obj)
-                        else:
-                            # no longer on the build plate, or part of a group,
-                            # remove for the future by adding a space in the comment
-                            out.write("/* cura-export{0}*/".format(comment))
-                    out.write(post)
-
-                self.parseFileComments(file, _writer)
-                #TODO: keep project settings?
-
-            os.rename(file, file + '.old')
-            os.rename(tmp, file)
-            # only parts that have been removed from the file in between, log them for debug
-            for part in self.parts: Logger.log("d", "leftover:{0}".format(part))
+        if scene.mixedGroups():
+            #TODO: warning
+            return
+
+        # everything the writer thread needs from the scene, decorations are only called on this thread:
+        # {group: (is group, [(saved text, [obj])])} for every top group
+        saves = {}
+        for node in scene.groups():
+            is_group = node.hasDecoration('isGroup')
+            nodes = node.getChildren() if is_group else [node]
+            saves[node] = (is_group, [(child.callDecoration("save"), [child.getDecorator(OpenSCADDecorator).obj])
+                                      for child in nodes if child.hasDecoration("save")])
+        # file I/O and parsing happen on the writer thread, G-code output does not wait for them
+        self._writeBack.submit((scene, saves))
+
+    def _writeFiles(self, job):
+        # called from the writer thread with the scene data of the last write
+        scene, saves = job
+        written = []
+        failed = []
+        for file in scene.fileNames():
+            try:
+                with Instrumentation.span(Instrumentation.WRITE_BACK, file):
+                    if self._writeFile(file, scene, saves):
+                        written.append(file)
+            except Exception as e:
+                Logger.logException("e", "Failed to write back {0}".format(file))
+                failed.append((file, str(e)))
+        self._writeTrace()
+        if written or failed:
+            Application.getInstance().callLater(self._showWriteBackMessage, written, failed)
+
+    def _writeFile(self, file, scene, saves):
+        # True if file was written
+        with self._index_lock:
+            # nothing changed since the file was read or written, don't touch it at all
+            cached = self._indexes.get(file)
+            if cached is not None and \
+                    WriteBack.digest(self._exportBlocks(file, cached[1], scene, saves).values()) == cached[2]:
+                Logger.log("d", "unchanged: {0}".format(file))
+                return False
+            # only the changed cura-export blocks are written, in place if they fit
+            for rescan in (False, True):
+                comments = self._fileIndex(file, rescan)
+                texts = self._exportBlocks(file, comments, scene, saves)
+                changes = {comment: text.encode('utf-8') for comment, text in texts.items()
+                           if WriteBack.normalized(text) != WriteBack.normalized(WriteBack.blockText(comment))}
+                if not changes:
+                    return False
+                Logger.log("d", "write back {0} of {1} blocks to {2}".format(len(changes), len(texts), file))
+                index = WriteBack.patch(file, comments, changes)
+                if index is not None:
+                    Instrumentation.count("bytes written", sum(comment.length for comment in changes), file)
+                else:
+                    index = WriteBack.rewrite(file, comments, changes)
+                    if index is not None:
+                        Instrumentation.count("bytes written", os.path.getsize(file), file)
+                if index is not None:
+                    self._setIndex(file, index)
+                    Logger.log("i", "wrote back {0}".format(file))
+                    return True
+        raise RuntimeError("{0} changed while writing back".format(os.path.basename(file)))
+
+    def _showWriteBackMessage(self, written, failed):
+        if failed:
+            text = "\n".join("{0}: {1}".format(os.path.basename(file), error) for file, error in failed)
+            Message(i18n_catalog.i18nc("@info:status", "Could not save changes to {0}").format(text),
+                    title=i18n_catalog.i18nc("@info:title", "OpenSCAD")).show()
+        if written:
+            text = ", ".join(os.path.basename(file) for file in written)
+            Message(i18n_catalog.i18nc("@info:status", "Saved changes to {0}").format(text), lifetime=5,
+                    title=i18n_catalog.i18nc("@info:title", "OpenSCAD")).show()
+
+    def _exportBlocks(self, file, comments, scene, saves):
+        # {comment: text} with the new text of every cura-export block of file
+        parser = self._parser()
+        # parts of this file not written yet
+        remaining = scene.parts(file)
+        texts = {}
+        for comment in comments:
+            if comment.kind != 'export':
+                # TODO: how to deal with profile changes?
+                # profile and unknown sections are kept as they are
+                continue
+            out = []
+            part = parser.read(comment.text)
+            if set(part.keys()).issubset(remaining):
+                Logger.log("d", "found:{0}".format(part.keys()))
+                # this might return multiple groups (after ungrouping)
+                groups = scene.groupsOf(file, part.keys())
+                Logger.log("d", "groups:{0}".format(groups))
+
+                for node in groups:
+                    is_group, children = saves[node]
+                    if is_group:
+                        out.append("/*cura-export\n")
+                        for text, objs in children:
+                            out.append("{0}\n".format(text))
+                            remaining.difference_update(objs)
+                        out.append("*/")
+                    else:
+                        text, objs = children[0]
+                        out.append("/*cura-export\n{0}\n*/".format(text))
+                        Logger.log("d", "remove:{0}".format(objs))
+                        remaining.difference_update(objs)
+            else:
+                # no longer on the build plate, or part of a group,
+                # remove for the future by adding a space in the comment
+                out.append("/* cura-export{0}*/".format(comment.text))
+            if out:
+                texts[comment] = ''.join(out)
+        #TODO: keep project settings?
+        # only parts that have been removed from the file in between, log them for debug
+        for part in remaining: Logger.log("d", "leftover:{0}".format(part))
+        return texts
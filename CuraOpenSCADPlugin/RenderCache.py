@@ -0,0 +1,89 @@
+# built-ins
+import os
+import shutil
+import hashlib
+import threading
+import uuid
+
+from .DependencyGraph import DependencyGraph, scan
+
+
+class RenderCache(object):
+    # content addressed store of rendered meshes, least recently used entries are evicted
+    # once the cache grows beyond max_size bytes
+
+    def __init__(self, directory, max_size, graph=None):
+        self.directory = directory
+        self.max_size = max_size
+        self.graph = graph if graph is not None else DependencyGraph()
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, wrapper_file, flags, version):
+        # the wrapper holds the source expression and the including file,
+        # everything it includes and how openscad is called decides about the result
+        digest = hashlib.sha256()
+        digest.update(version.encode())
+        for flag in flags:
+            digest.update(b'\0' + flag.encode())
+        wrapper = scan(wrapper_file, self.graph.library_paths)
+        # the wrapper itself is a temporary file, its name does not matter
+        digest.update(b'\0' + wrapper.digest.encode())
+        files = set()
+        for dependency in wrapper.dependencies:
+            files.update(self.graph.closure(dependency))
+        for path in sorted(files):
+            digest.update(b'\0' + os.fsencode(path) + b'\0' + self.graph.files[path].digest.encode())
+        return digest.hexdigest()
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, key[:2], "{0}.{1}".format(key, extension.lstrip('.')))
+
+    def get(self, key, extension):
+        path = self._path(key, extension)
+        try:
+            # mark as recently used
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key, extension, file_name):
+        path = self._path(key, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = "{0}.{1}.tmp".format(path, uuid.uuid4())
+        shutil.copyfile(file_name, tmp)
+        os.replace(tmp, path)
+        self.evict()
+        return path
+
+    def _entries(self):
+        entries = []
+        for sub in os.scandir(self.directory):
+            if sub.is_dir():
+                for entry in os.scandir(sub.path):
+                    if entry.is_file() and not entry.name.endswith('.tmp'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        with self._lock:
+            return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            while entries and total > self.max_size:
+                _, size, path = entries.pop(0)
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory, exist_ok=True)
@@ -0,0 +1,58 @@
+# Wall time and peak memory of past renders, kept next to the geometry cache so that the
+# next session can plan its renders, see RenderScheduler
+
+# built-ins
+import os
+import json
+import uuid
+import hashlib
+import threading
+
+
+def renderName(wrapper, flags=()):
+    # the same wrapper source rendered with the same flags gives the same mesh
+    digest = hashlib.sha1(wrapper.encode('utf-8'))
+    for flag in flags:
+        digest.update(b'\0' + flag.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class RenderHistory(object):
+    # {name: {"wall_time": seconds, "peak_rss": bytes or None}}, file_name None keeps it in memory only
+
+    def __init__(self, file_name=None, max_entries=10000):
+        self.file_name = file_name
+        self.max_entries = max_entries
+        self._entries = {}
+        self._changed = False
+        self._lock = threading.Lock()
+        if file_name:
+            try:
+                with open(file_name) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+
+    def get(self, name):
+        with self._lock:
+            return self._entries.get(name)
+
+    def record(self, name, wall_time, peak_rss=None):
+        with self._lock:
+            # the latest run replaces the entry and moves it to the end, the oldest are dropped first
+            self._entries.pop(name, None)
+            self._entries[name] = {"wall_time": wall_time, "peak_rss": peak_rss}
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._changed = True
+
+    def save(self):
+        with self._lock:
+            if not self.file_name or not self._changed:
+                return
+            os.makedirs(os.path.dirname(self.file_name), exist_ok=True)
+            tmp = "{0}.{1}.tmp".format(self.file_name, uuid.uuid4())
+            with open(tmp, 'w') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp, self.file_name)
+            self._changed = False
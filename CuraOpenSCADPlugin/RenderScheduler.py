@@ -0,0 +1,178 @@
+# Runs the renders of all opened files on one set of threads: promoted parts first, otherwise the
+# files take turns and every file starts with the part expected to be the fastest.
+# A render only starts while the expected peak memory of all running renders fits into the budget.
+
+# built-ins
+import os
+import sys
+import heapq
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class _Job(object):
+    __slots__ = ('file_key', 'part_key', 'estimate', 'memory', 'seq', 'future', 'fn', 'args', 'taken')
+
+    def __init__(self, file_key, part_key, estimate, memory, seq, fn, args):
+        self.file_key = file_key
+        self.part_key = part_key
+        # unknown parts after the known ones, in the order they were submitted
+        self.estimate = float('inf') if estimate is None else estimate
+        self.memory = memory or 0
+        self.seq = seq
+        self.future = Future()
+        self.fn = fn
+        self.args = args
+        self.taken = False
+
+    def __lt__(self, other):
+        return (self.estimate, self.seq) < (other.estimate, other.seq)
+
+
+def physicalMemory():
+    # bytes of RAM, None if unknown
+    if sys.platform == 'win32':
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [('dwLength', ctypes.c_ulong),
+                        ('dwMemoryLoad', ctypes.c_ulong),
+                        ('ullTotalPhys', ctypes.c_ulonglong),
+                        ('ullAvailPhys', ctypes.c_ulonglong),
+                        ('ullTotalPageFile', ctypes.c_ulonglong),
+                        ('ullAvailPageFile', ctypes.c_ulonglong),
+                        ('ullTotalVirtual', ctypes.c_ulonglong),
+                        ('ullAvailVirtual', ctypes.c_ulonglong),
+                        ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(status)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys
+        return None
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class RenderScheduler(object):
+    def __init__(self, workers, memory_budget=None):
+        self.workers = workers
+        # bytes, None = unlimited
+        self.memory_budget = memory_budget
+        # expected peak memory of the running jobs
+        self._memory = 0
+        self._running = 0
+        self._condition = threading.Condition()
+        # {file_key: heap of _Job}, in the order the files take turns
+        self._files = OrderedDict()
+        # {(file_key, part_key): [_Job]} of waiting jobs
+        self._waiting = {}
+        self._promoted = []
+        self._seq = itertools.count()
+        self._threads = 0
+
+    def setWorkers(self, workers):
+        with self._condition:
+            self.workers = workers
+            self._startThreads()
+            # idle threads beyond the limit end
+            self._condition.notify_all()
+
+    def setMemoryBudget(self, memory_budget):
+        with self._condition:
+            self.memory_budget = memory_budget
+            self._condition.notify_all()
+
+    def submit(self, file_key, part_key, estimate, fn, *args, memory=None):
+        # Future of fn(*args), estimate: expected wall time in seconds or None,
+        # memory: expected peak memory in bytes
+        job = _Job(file_key, part_key, estimate, memory, next(self._seq), fn, args)
+        with self._condition:
+            heapq.heappush(self._files.setdefault(file_key, []), job)
+            self._waiting.setdefault((file_key, part_key), []).append(job)
+            self._startThreads()
+            self._condition.notify()
+        return job.future
+
+    def promote(self, file_key, part_key):
+        # the waiting jobs of this part are started next
+        with self._condition:
+            for job in self._waiting.get((file_key, part_key), ()):
+                if job not in self._promoted:
+                    self._promoted.append(job)
+
+    def pending(self, file_key=None):
+        with self._condition:
+            return sum(1 for jobs in self._waiting.values() for job in jobs
+                       if file_key is None or job.file_key == file_key)
+
+    def _startThreads(self):
+        while self._threads < self.workers:
+            self._threads += 1
+            threading.Thread(target=self._run, name="OpenSCADRender", daemon=True).start()
+
+    def _fits(self, job):
+        # the only running job may use all memory, or more, otherwise a large part would never start
+        return self.memory_budget is None or self._running == 0 or \
+            self._memory + job.memory <= self.memory_budget
+
+    def _take(self, job):
+        job.taken = True
+        self._running += 1
+        self._memory += job.memory
+        jobs = self._waiting[(job.file_key, job.part_key)]
+        jobs.remove(job)
+        if not jobs:
+            del self._waiting[(job.file_key, job.part_key)]
+        return job
+
+    def _next(self):
+        # next job to run or None, called with the lock held
+        self._promoted = [job for job in self._promoted if not job.taken]
+        for job in self._promoted:
+            if self._fits(job):
+                self._promoted.remove(job)
+                return self._take(job)
+        for file_key in list(self._files):
+            heap = self._files[file_key]
+            while heap and heap[0].taken:
+                heapq.heappop(heap)
+            if not heap:
+                del self._files[file_key]
+                continue
+            if not self._fits(heap[0]):
+                # waits for running jobs to end, the next file might have a smaller one
+                continue
+            # the other files come first next time
+            self._files.move_to_end(file_key)
+            return self._take(heapq.heappop(heap))
+        return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._threads > self.workers:
+                        # fewer workers configured
+                        self._threads -= 1
+                        return
+                    job = self._next()
+                    if job is not None:
+                        break
+                    self._condition.wait()
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    try:
+                        job.future.set_result(job.fn(*job.args))
+                    except BaseException as e:
+                        job.future.set_exception(e)
+            finally:
+                with self._condition:
+                    self._running -= 1
+                    self._memory -= job.memory
+                    # memory became free, waiting threads check again
+                    self._condition.notify_all()
@@ -0,0 +1,205 @@
+# Pool of long-lived RenderWorker processes fed from one job queue through their stdin/stdout pipes,
+# the workers keep the openscad version, library scan and geometry cache index between renders
+
+# built-ins
+import os
+import sys
+import json
+import time
+import queue
+import itertools
+import threading
+import subprocess
+from concurrent.futures import Future
+
+from . import OpenSCADBinary
+from . import OpenSCADProcess
+from .OpenSCADProcess import RenderResult, RenderError
+
+
+def available():
+    # the workers are started with the python interpreter, a frozen application does not have one
+    return not getattr(sys, 'frozen', False)
+
+
+class _WorkerProcess(object):
+    def __init__(self, command, env):
+        self.command = command
+        self.env = env
+        self._process = None
+        self._replies = None
+
+    def _start(self):
+        group = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP} if sys.platform == 'win32' else \
+            {'start_new_session': True}
+        # the package is imported from the folder above it, whatever the plugin folder is named
+        package = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(self.env or os.environ)
+        env["PYTHONPATH"] = os.pathsep.join([package] + [p for p in [env.get("PYTHONPATH")] if p])
+        self._process = subprocess.Popen(self.command, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         universal_newlines=True, encoding='utf-8', **group)
+        self._replies = queue.Queue()
+        threading.Thread(target=self._read, args=(self._process, self._replies),
+                         name="OpenSCADRenderWorkerOutput", daemon=True).start()
+
+    @staticmethod
+    def _read(process, replies):
+        for line in process.stdout:
+            replies.put(line)
+        # None: the worker is gone
+        replies.put(None)
+
+    def kill(self):
+        if self._process is not None:
+            OpenSCADProcess.killTree(self._process)
+            self._process.wait()
+            self._process = None
+
+    def stop(self):
+        if self._process is not None:
+            try:
+                self._process.stdin.close()
+                self._process.wait(5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.kill()
+            self._process = None
+
+    def _reply(self, timeout):
+        # next line of the worker, '' if there was none within timeout, None if the worker is gone
+        try:
+            return self._replies.get(timeout=timeout)
+        except queue.Empty:
+            return ''
+
+    def _abort(self, job, grace):
+        # reply of the worker to a cancel message, the worker kills its openscad run and answers,
+        # None if it did not within grace seconds, it is killed then
+        try:
+            self._process.stdin.write(json.dumps({"cancel": job["id"]}) + "\n")
+            self._process.stdin.flush()
+            line = self._reply(grace)
+        except OSError:
+            line = None
+        if line:
+            return json.loads(line)
+        # a hanging worker leaves its openscad run behind, it ends with its time limit or the render
+        self.kill()
+        return None
+
+    def call(self, job, timeout=None, cancel=None, poll_interval=0.05, grace=5.0):
+        # reply of the worker for job, a cancel or timeout is passed on to the worker, which is
+        # killed when it does not answer to that or stops answering at all
+        if self._process is None or self._process.poll() is not None:
+            self._start()
+        try:
+            self._process.stdin.write(json.dumps(job) + "\n")
+            self._process.stdin.flush()
+        except OSError:
+            self.kill()
+            raise RenderError("Render worker is gone")
+
+        start = time.monotonic()
+        while True:
+            line = self._reply(poll_interval)
+            if line is None:
+                self.kill()
+                raise RenderError("Render worker ended unexpectedly")
+            if line:
+                return json.loads(line)
+            wall_time = time.monotonic() - start
+            if cancel is not None and cancel.is_set():
+                reply = self._abort(job, grace)
+                if reply is not None:
+                    return reply
+                raise RenderError("Rendering of {0} cancelled".format(job["wrapper"]),
+                                  RenderResult(None, '', time.monotonic() - start, None, False, True))
+            # the worker enforces timeout itself, this is only for a worker that hangs
+            if timeout is not None and wall_time > timeout + grace:
+                reply = self._abort(job, grace)
+                if reply is not None:
+                    return reply
+                raise RenderError("Rendering of {0} timed out after {1:.0f}s".format(job["wrapper"], timeout),
+                                  RenderResult(None, '', time.monotonic() - start, None, True, False))
+
+
+class RenderServer(object):
+    # same render() as Renderer, jobs of all callers are queued and run by workers processes
+
+    def __init__(self, cmd, env=None, workers=None, cache_directory=None, cache_size=1024 * 1024 * 1024,
+                 stub=False, stub_delay=0.0):
+        self.workers = workers or os.cpu_count() or 1
+        if stub:
+            self.version, self.extension, self.flags = 'stub', 'stl', []
+        else:
+            self.version = OpenSCADBinary.probeVersion(cmd, env)
+            self.extension, self.flags = OpenSCADBinary.exportFormat(self.version)
+
+        command = [sys.executable, '-m', '{0}.RenderWorker'.format(__package__)]
+        if stub:
+            command += ['--stub', '--stub-delay', str(stub_delay)]
+        else:
+            command += ['--openscad', cmd]
+            if cache_directory:
+                command += ['--cache', cache_directory, '--cache-size', str(max(1, cache_size // (1024 * 1024)))]
+        self._command = command
+        self._env = env
+        self._jobs = queue.Queue()
+        self._ids = itertools.count(1)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, args=(_WorkerProcess(self._command, self._env),),
+                                          name="OpenSCADRenderServer", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self, worker):
+        try:
+            while True:
+                item = self._jobs.get()
+                if item is None:
+                    return
+                future, job, timeout, cancel = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(self._result(worker.call(job, timeout, cancel)))
+                except Exception as e:
+                    future.set_exception(e)
+        finally:
+            worker.stop()
+
+    @staticmethod
+    def _result(reply):
+        result = RenderResult(**reply["result"]) if reply.get("result") else None
+        if "error" in reply:
+            raise RenderError(reply["error"], result)
+        return reply["mesh"], result
+
+    def submit(self, wrapper_file, output, flags=(), timeout=None, cancel=None):
+        # Future of (mesh file, RenderResult), see Renderer.render
+        self._start()
+        future = Future()
+        if cancel is not None and cancel.is_set():
+            future.set_exception(RenderError("Rendering of {0} cancelled".format(wrapper_file)))
+            return future
+        if timeout is not None and timeout <= 0:
+            future.set_exception(RenderError("Time limit for {0} reached".format(wrapper_file)))
+            return future
+        job = {"id": next(self._ids), "wrapper": wrapper_file, "output": output,
+               "flags": list(flags), "timeout": timeout}
+        self._jobs.put((future, job, timeout, cancel))
+        return future
+
+    def render(self, wrapper_file, output, flags=(), timeout=None, cancel=None):
+        return self.submit(wrapper_file, output, flags, timeout, cancel).result()
+
+    def stop(self):
+        # workers finish their current job and end
+        with self._lock:
+            for _ in self._threads:
+                self._jobs.put(None)
+            self._threads = []
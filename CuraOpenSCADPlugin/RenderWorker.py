@@ -0,0 +1,130 @@
+# Worker process of the RenderServer: reads one job per line (JSON) from stdin, renders it and
+# answers with one line on stdout, stays alive until stdin is closed
+#   python -m CuraOpenSCADPlugin.RenderWorker [--stub] [--openscad cmd] [--cache dir] [--cache-size MB]
+#
+# job:   {"id": 1, "wrapper": "/tmp/x.scad", "output": "/tmp/x.stl", "flags": [], "timeout": null}
+#        {"cancel": 1} kills the openscad run of job 1, which is answered with a cancelled error
+# reply: {"id": 1, "mesh": "/tmp/x.stl", "result": {RenderResult fields} or null on a cache hit}
+#        {"id": 1, "error": "message", "result": {RenderResult fields} or null}
+
+# built-ins
+import sys
+import json
+import time
+import queue
+import struct
+import argparse
+import threading
+
+from . import OpenSCADBinary
+from .OpenSCADProcess import RenderResult, RenderError
+from .RenderCache import RenderCache
+from .Renderer import Renderer
+
+# a tetrahedron, written by the stub worker instead of running openscad
+_stub_facets = [((0, 0, 0), (0, 10, 0), (10, 0, 0)),
+                ((0, 0, 0), (10, 0, 0), (0, 0, 10)),
+                ((0, 0, 0), (0, 0, 10), (0, 10, 0)),
+                ((10, 0, 0), (0, 10, 0), (0, 0, 10))]
+
+
+class StubRenderer(object):
+    # same interface as Renderer, for testing the server without openscad
+    version = 'stub'
+    extension = 'stl'
+    flags = []
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def render(self, wrapper_file, output, flags=(), timeout=None, cancel=None):
+        start = time.monotonic()
+        if cancel is not None:
+            if cancel.wait(self.delay):
+                raise RenderError("Rendering of {0} cancelled".format(wrapper_file),
+                                  RenderResult(None, '', time.monotonic() - start, None, False, True))
+        else:
+            time.sleep(self.delay)
+        with open(output, 'wb') as f:
+            f.write(b'\0' * 80 + struct.pack('<I', len(_stub_facets)))
+            for facet in _stub_facets:
+                f.write(struct.pack('<3f', 0, 0, 0))
+                for vertex in facet:
+                    f.write(struct.pack('<3f', *vertex))
+                f.write(b'\0\0')
+        return output, RenderResult(0, '', time.monotonic() - start, None, False, False)
+
+
+def handle(renderer, job, cancel=None):
+    reply = {"id": job.get("id")}
+    try:
+        mesh, result = renderer.render(job["wrapper"], job["output"], job.get("flags", []), job.get("timeout"),
+                                       cancel)
+        reply["mesh"] = mesh
+        reply["result"] = result._asdict() if result else None
+    except RenderError as e:
+        reply["error"] = str(e)
+        reply["result"] = e.result._asdict() if e.result else None
+    except Exception as e:
+        reply["error"] = "{0}: {1}".format(type(e).__name__, e)
+        reply["result"] = None
+    return reply
+
+
+def _read(stream, jobs, cancels, lock):
+    # runs next to the render, so that a cancel message reaches the running job
+    for line in stream:
+        if not line.strip():
+            continue
+        message = json.loads(line)
+        with lock:
+            if "cancel" in message:
+                event = cancels.get(message["cancel"])
+                if event is not None:
+                    event.set()
+                continue
+            cancels[message.get("id")] = threading.Event()
+        jobs.put(message)
+    # stdin closed: the server stopped or is gone, nothing is left running
+    with lock:
+        for event in cancels.values():
+            event.set()
+    jobs.put(None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m CuraOpenSCADPlugin.RenderWorker")
+    parser.add_argument("--openscad", default=OpenSCADBinary.defaultCommand())
+    parser.add_argument("--cache")
+    parser.add_argument("--cache-size", type=int, default=1024)
+    parser.add_argument("--stub", action="store_true", help="write a fixed mesh instead of running openscad")
+    parser.add_argument("--stub-delay", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    if args.stub:
+        renderer = StubRenderer(args.stub_delay)
+    else:
+        env = OpenSCADBinary.environment()
+        cache = RenderCache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+        renderer = Renderer(OpenSCADBinary.resolve(args.openscad, env), env, cache)
+
+    jobs = queue.Queue()
+    # {job id: threading.Event} of the queued and running jobs
+    cancels = {}
+    lock = threading.Lock()
+    threading.Thread(target=_read, args=(sys.stdin, jobs, cancels, lock), daemon=True).start()
+    while True:
+        job = jobs.get()
+        if job is None:
+            return 0
+        with lock:
+            cancel = cancels[job.get("id")]
+        reply = handle(renderer, job, cancel)
+        with lock:
+            del cancels[job.get("id")]
+        sys.stdout.write(json.dumps(reply) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
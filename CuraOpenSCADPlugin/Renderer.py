@@ -0,0 +1,82 @@
+# Renders a wrapper .scad file into a mesh file with the geometry cache in front of openscad,
+# without Uranium so that the batch converter can use it as well
+
+# built-ins
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+import threading
+
+from . import OpenSCADBinary
+from . import OpenSCADProcess
+from .OpenSCADProcess import RenderError
+
+# {in memory: folder}
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _sessionDirectory(memory):
+    # one folder per process, removed with everything left in it when the process ends
+    with _sessions_lock:
+        if memory not in _sessions:
+            base = None
+            if memory and sys.platform.startswith('linux') and os.access('/dev/shm', os.W_OK):
+                base = '/dev/shm'
+            _sessions[memory] = tempfile.mkdtemp(prefix="openscad-", dir=base)
+            atexit.register(shutil.rmtree, _sessions[memory], True)
+        return _sessions[memory]
+
+
+def scratchDirectory():
+    # folder for wrapper files, in memory (tmpfs) where possible
+    return _sessionDirectory(True)
+
+
+def meshDirectory():
+    # folder for rendered meshes, in the regular temp folder: meshes can be hundreds of MB each, a small
+    # /dev/shm would fill up and memory used there is not part of the memory budget
+    return _sessionDirectory(False)
+
+
+class Renderer(object):
+    def __init__(self, cmd, env=None, cache=None):
+        self.cmd = cmd
+        self.env = env
+        self.cache = cache
+        self.version = OpenSCADBinary.probeVersion(cmd, env)
+        self.extension, self.flags = OpenSCADBinary.exportFormat(self.version)
+
+    def render(self, wrapper_file, output, flags=(), timeout=None, cancel=None):
+        # (mesh file, RenderResult), the mesh file is output or the cache entry on a cache hit,
+        # the result is None then, raises RenderError if openscad failed, timed out or was cancelled
+        if cancel is not None and cancel.is_set():
+            raise RenderError("Rendering of {0} cancelled".format(wrapper_file))
+
+        flags = self.flags + list(flags)
+        extension = os.path.splitext(output)[1]
+        key = None
+        if self.cache:
+            key = self.cache.key(wrapper_file, flags, self.version)
+            cached = self.cache.get(key, extension)
+            if cached:
+                return cached, None
+
+        if timeout is not None and timeout <= 0:
+            raise RenderError("Time limit for {0} reached".format(wrapper_file))
+
+        cmd = [self.cmd] + flags + ['-o', output, wrapper_file]
+        result = OpenSCADProcess.run(cmd, cwd=os.path.split(wrapper_file)[0], env=self.env,
+                                     timeout=timeout, cancel=cancel)
+        if result.cancelled:
+            raise RenderError("Rendering of {0} cancelled".format(wrapper_file), result)
+        if result.timed_out:
+            raise RenderError("Rendering of {0} timed out after {1:.0f}s".format(wrapper_file, timeout), result)
+        if result.returncode != 0 or not os.path.isfile(output) or os.path.getsize(output) == 0:
+            raise RenderError("openscad failed with exit code {0}: {1}".format(result.returncode, result.stderr.strip()), result)
+
+        if key:
+            self.cache.put(key, extension, output)
+        return output, result
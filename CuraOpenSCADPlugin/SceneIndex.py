@@ -0,0 +1,60 @@
+# Lookup tables over the Index(file_name, group, obj) entries of the scene, see sceneItems,
+# every lookup during write back is a dictionary access instead of a scan over all entries
+
+from collections import namedtuple
+
+Index = namedtuple('Index', ['file_name', 'group', 'obj'])
+
+
+def sceneItems(root, decorator_type):
+    # [Index] for every node below root with a decorator_type decoration, in depth first order,
+    # group is the outermost group around the node or the node itself
+    items = []
+    stack = [(root, None)]
+    while stack:
+        node, top = stack.pop()
+        if top is None and node.hasDecoration('isGroup'):
+            top = node
+        decorator = node.getDecorator(decorator_type)
+        if decorator is not None:
+            items.append(Index(decorator.file_name, node if top is None else top, decorator.obj))
+        children = node.getChildren()
+        if children:
+            stack.extend((child, top) for child in reversed(children))
+    return items
+
+
+class SceneIndex(object):
+    def __init__(self, items):
+        # {file_name: {obj: [group]}}, a part can be on the build plate more than once
+        self._owners = {}
+        # {group: set(file_name)}
+        self._files = {}
+        for item in items:
+            groups = self._owners.setdefault(item.file_name, {}).setdefault(item.obj, [])
+            if item.group not in groups:
+                groups.append(item.group)
+            self._files.setdefault(item.group, set()).add(item.file_name)
+
+    def fileNames(self):
+        return list(self._owners)
+
+    def groups(self):
+        return list(self._files)
+
+    def mixedGroups(self):
+        # groups made from parts of more than one file
+        return [group for group, files in self._files.items() if len(files) > 1]
+
+    def parts(self, file_name):
+        # set of all parts of file_name on the build plate
+        return set(self._owners.get(file_name, {}))
+
+    def groupsOf(self, file_name, objs):
+        # top groups holding any of objs, in order of objs
+        owners = self._owners.get(file_name, {})
+        groups = {}
+        for obj in objs:
+            for group in owners.get(obj, ()):
+                groups[group] = None
+        return list(groups)
@@ -0,0 +1,264 @@
+# Writes changed cura-export blocks back into .scad files by byte range, see CommentScanner
+
+# built-ins
+import os
+import time
+import shutil
+import struct
+import hashlib
+import threading
+
+from . import CommentScanner
+
+# extra room in rewritten blocks, so later changes can be patched in place
+MIN_SLACK = 64
+_chunk = 1024 * 1024
+_journal_magic = b'cura-write-back 1\n'
+
+
+def blockText(comment):
+    return '/*cura-{0}{1}*/'.format(comment.kind, comment.text)
+
+
+def normalized(text):
+    # whitespace before the closing '*/' is padding, not content
+    if text.endswith('*/'):
+        return text[:-2].rstrip() + '*/'
+    return text
+
+
+def digest(texts):
+    # digest of the cura-export blocks of a file, padding does not count
+    h = hashlib.sha1()
+    for text in texts:
+        h.update(normalized(text).encode('utf-8'))
+        h.update(b'\0')
+    return h.digest()
+
+
+def _pad(data, length):
+    return data[:-2] + b' ' * (length - len(data)) + b'*/'
+
+
+def _matches(data, comment):
+    return data.decode('utf-8', errors='replace') == blockText(comment)
+
+
+def _reindex(comments, written):
+    # comments after replacing the ranges in written {comment: bytes}, later comments move by the size difference
+    result = []
+    shift = 0
+    for comment in comments:
+        if comment in written:
+            data = written[comment]
+            result.extend(c._replace(offset=c.offset + comment.offset + shift) for c in CommentScanner.scan(data))
+            shift += len(data) - comment.length
+        else:
+            result.append(comment._replace(offset=comment.offset + shift))
+    return result
+
+
+def journalName(file_name):
+    return os.path.join(os.path.dirname(file_name), '.' + os.path.basename(file_name) + '.journal')
+
+
+def _syncDirectory(path):
+    # makes a new or removed file in path durable, not possible on Windows
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(path or '.', os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _writeJournal(file_name, size, ranges):
+    # size of the file and [(offset, old bytes)] of the ranges about to be overwritten, with a checksum,
+    # on disk before the first byte of the file is touched
+    data = bytearray(_journal_magic)
+    data += struct.pack('<QI', size, len(ranges))
+    for offset, old in ranges:
+        data += struct.pack('<QI', offset, len(old)) + old
+    data += hashlib.sha1(data).digest()
+    with open(journalName(file_name), 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    _syncDirectory(os.path.dirname(file_name))
+
+
+def _readJournal(journal):
+    # (size, [(offset, old bytes)]), None if the journal is incomplete
+    with open(journal, 'rb') as f:
+        data = f.read()
+    if len(data) < len(_journal_magic) + 32 or not data.startswith(_journal_magic) or \
+            hashlib.sha1(data[:-20]).digest() != data[-20:]:
+        return None
+    position = len(_journal_magic)
+    size, count = struct.unpack_from('<QI', data, position)
+    position += 12
+    ranges = []
+    for _ in range(count):
+        offset, length = struct.unpack_from('<QI', data, position)
+        position += 12
+        ranges.append((offset, data[position:position + length]))
+        position += length
+    return size, ranges
+
+
+def _removeJournal(file_name):
+    os.remove(journalName(file_name))
+    # a journal that comes back after a crash would undo the finished patch
+    _syncDirectory(os.path.dirname(file_name))
+
+
+def recover(file_name):
+    # undoes a patch that was interrupted, the file is as before the patch then, called before every scan,
+    # True if the file was restored
+    journal = journalName(file_name)
+    if not os.path.exists(journal):
+        return False
+    entry = _readJournal(journal)
+    # an incomplete journal was written before the file was touched, a file with a different size
+    # was replaced since, e.g. by an editor
+    restored = entry is not None and os.path.getsize(file_name) == entry[0]
+    if restored:
+        with open(file_name, 'r+b') as f:
+            for offset, old in entry[1]:
+                f.seek(offset)
+                f.write(old)
+            f.flush()
+            os.fsync(f.fileno())
+    _removeJournal(file_name)
+    return restored
+
+
+def patch(file_name, comments, changes):
+    # writes changes {comment: bytes} over the ranges of the old comments, padded with spaces,
+    # returns the new comments of the file, None if a change does not fit or the file does not match comments
+    # the old ranges are journaled first, recover() undoes a patch that was interrupted by a crash
+    if any(len(data) > comment.length for comment, data in changes.items()):
+        return None
+    recover(file_name)
+    written = {comment: _pad(data, comment.length) for comment, data in changes.items()}
+    with open(file_name, 'r+b') as f:
+        ranges = []
+        for comment in sorted(written):
+            f.seek(comment.offset)
+            old = f.read(comment.length)
+            if not _matches(old, comment):
+                return None
+            ranges.append((comment.offset, old))
+        _writeJournal(file_name, os.fstat(f.fileno()).st_size, ranges)
+        # on an error the journal stays, the next scan restores the file
+        for comment in sorted(written):
+            f.seek(comment.offset)
+            f.write(written[comment])
+        f.flush()
+        os.fsync(f.fileno())
+    _removeJournal(file_name)
+    return _reindex(comments, written)
+
+
+def _copy(inp, out, length):
+    while length > 0:
+        data = inp.read(min(length, _chunk))
+        if not data:
+            break
+        out.write(data)
+        length -= len(data)
+
+
+def rewrite(file_name, comments, changes):
+    # streams file_name into a hidden file with changes {comment: bytes} applied and renames it,
+    # the original is kept as .old, returns the new comments of the file, None if the file does not match comments
+    recover(file_name)
+    written = {comment: _pad(data, len(data) + max(MIN_SLACK, len(data) // 4)) for comment, data in changes.items()}
+    tmp = os.path.join(os.path.dirname(file_name), '.' + os.path.basename(file_name))
+    with open(file_name, 'rb') as inp, open(tmp, 'wb') as out:
+        position = 0
+        for comment in sorted(written):
+            _copy(inp, out, comment.offset - position)
+            if not _matches(inp.read(comment.length), comment):
+                break
+            out.write(written[comment])
+            position = comment.offset + comment.length
+        else:
+            while True:
+                data = inp.read(_chunk)
+                if not data:
+                    break
+                out.write(data)
+            out.flush()
+            os.fsync(out.fileno())
+            position = None
+    if position is not None:
+        # the file changed since it was scanned
+        os.remove(tmp)
+        return None
+    shutil.copymode(file_name, tmp)
+
+    # the file is replaced in one step, the backup is a second link to the original if possible
+    backup = file_name + '.old'
+    if os.path.lexists(backup):
+        os.remove(backup)
+    try:
+        os.link(file_name, backup)
+    except OSError:
+        shutil.copy2(file_name, backup)
+    os.replace(tmp, file_name)
+    return _reindex(comments, written)
+
+
+class WriteBackQueue(object):
+    # calls callback(job) from a background thread, a job submitted while another one is waiting
+    # replaces it: jobs submitted within delay seconds of each other are written once
+    # the thread only lives while there is work, so a pending write is finished before Cura exits
+
+    def __init__(self, callback, delay=0.5):
+        self.callback = callback
+        self.delay = delay
+        self._job = None
+        self._submitted = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def submit(self, job):
+        with self._condition:
+            self._job = job
+            self._submitted = time.monotonic()
+            self._condition.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="OpenSCADWriteBack")
+                self._thread.start()
+
+    def flush(self, timeout=None):
+        # waits until all submitted jobs are written
+        with self._condition:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _next(self):
+        with self._condition:
+            if self._job is None:
+                self._thread = None
+                return None
+            while True:
+                remaining = self._submitted + self.delay - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            job, self._job = self._job, None
+            return job
+
+    def _run(self):
+        while True:
+            job = self._next()
+            if job is None:
+                return
+            try:
+                self.callback(job)
+            except Exception:
+                # a failing job must not end the queue, callback reports its errors
+                pass
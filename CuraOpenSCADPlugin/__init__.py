@@ -1,10 +1,14 @@
 # Copyright (c) 2016 Thomas Karl Pietrowski
 
-# Uranium
-from UM.Platform import Platform # @UnresolvedImport
-from UM.Logger import Logger # @UnresolvedImport
-from UM.i18n import i18nCatalog # @UnresolvedImport
-i18n_catalog = i18nCatalog("OpenSCADPlugin")
+try:
+    # Uranium
+    from UM.Platform import Platform # @UnresolvedImport
+    from UM.Logger import Logger # @UnresolvedImport
+    from UM.i18n import i18nCatalog # @UnresolvedImport
+    i18n_catalog = i18nCatalog("OpenSCADPlugin")
+except ImportError:
+    # outside of Cura, e.g. python -m CuraOpenSCADPlugin.BatchConverter
+    pass
 
 def getMetaData():
     return {
@@ -0,0 +1,10 @@
+# parser_CommentParser_lextab.py. This file automatically created by PLY (version 3.11). Don't edit!
+_tabversion   = '3.10'
+_lextokens    = set(('True', 'False', 'COMMA', 'EQUAL', 'DSTRING', 'LIST', 'SETTINGS', 'FLOAT', 'SSTRING', 'FILE', 'AS', 'NAME', 'INTEGER'))
+_lexreflags   = 64
+_lexliterals  = ''
+_lexstateinfo = {'INITIAL': 'inclusive'}
+_lexstatere   = {'INITIAL': [('(?P<t_NAME>[a-zA-Z_][a-zA-Z0-9_]*)|(?P<t_FLOAT>[+-]?[0-9]*\\.[0-9]+)|(?P<t_INTEGER>[+-]?[0-9]+)|(?P<t_DSTRING>\\"[^\\"]*\\")|(?P<t_LIST>\\[[^\\]]*\\])|(?P<t_SSTRING>\\\'[^\\\']*\\\')|(?P<t_SETTINGS>SETTINGS)|(?P<t_False>False)|(?P<t_FILE>FILE)|(?P<t_True>True)|(?P<t_AS>AS)|(?P<t_COMMA>,)|(?P<t_EQUAL>=)', [None, ('t_NAME', 'NAME'), (None, 'FLOAT'), (None, 'INTEGER'), (None, 'DSTRING'), (None, 'LIST'), (None, 'SSTRING'), (None, 'SETTINGS'), (None, 'False'), (None, 'FILE'), (None, 'True'), (None, 'AS'), (None, 'COMMA'), (None, 'EQUAL')])]}
+_lexstateignore = {'INITIAL': ' \n\t\r\x0b\x0c'}
+_lexstateerrorf = {'INITIAL': 't_error'}
+_lexstateeoff = {}
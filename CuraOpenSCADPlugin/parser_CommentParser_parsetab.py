@@ -0,0 +1,52 @@
+
+# parser_CommentParser_parsetab.py
+# This file is automatically generated. Do not edit.
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'AS COMMA DSTRING EQUAL FILE FLOAT False INTEGER LIST NAME SETTINGS SSTRING Trueobjectlist : object\n                      | object objectlistobject : meshspec\n                  | meshspec SETTINGS keyvaluelistmeshspec : string\n                    | string AS NAME\n                    | FILE string\n                    | FILE string AS NAMEkeyvaluelist : keyvalue\n                        | keyvalue COMMA keyvaluelistkeyvalue : NAME EQUAL valuevalue : string\n                 | integer\n                 | float\n                 | boolean\n                 | liststring : SSTRING\n                  | DSTRINGlist : LISTinteger : INTEGERfloat : FLOATboolean : True\n                   | False'
+    
+_lr_action_items = {'FILE':([0,2,3,4,6,7,11,12,13,15,19,20,21,22,23,24,25,26,27,28,29,30,31,],[5,5,-3,-5,-17,-18,-7,-4,-9,-6,-8,-10,-11,-12,-13,-14,-15,-16,-20,-21,-22,-23,-19,]),'SSTRING':([0,2,3,4,5,6,7,11,12,13,15,18,19,20,21,22,23,24,25,26,27,28,29,30,31,],[6,6,-3,-5,6,-17,-18,-7,-4,-9,-6,6,-8,-10,-11,-12,-13,-14,-15,-16,-20,-21,-22,-23,-19,]),'DSTRING':([0,2,3,4,5,6,7,11,12,13,15,18,19,20,21,22,23,24,25,26,27,28,29,30,31,],[7,7,-3,-5,7,-17,-18,-7,-4,-9,-6,7,-8,-10,-11,-12,-13,-14,-15,-16,-20,-21,-22,-23,-19,]),'$end':([1,2,3,4,6,7,8,11,12,13,15,19,20,21,22,23,24,25,26,27,28,29,30,31,],[0,-1,-3,-5,-17,-18,-2,-7,-4,-9,-6,-8,-10,-11,-12,-13,-14,-15,-16,-20,-21,-22,-23,-19,]),'SETTINGS':([3,4,6,7,11,15,19,],[9,-5,-17,-18,-7,-6,-8,]),'AS':([4,6,7,11,],[10,-17,-18,16,]),'COMMA':([6,7,13,21,22,23,24,25,26,27,28,29,30,31,],[-17,-18,17,-11,-12,-13,-14,-15,-16,-20,-21,-22,-23,-19,]),'NAME':([9,10,16,17,],[14,15,19,14,]),'EQUAL':([14,],[18,]),'INTEGER':([18,],[27,]),'FLOAT':([18,],[28,]),'True':([18,],[29,]),'False':([18,],[30,]),'LIST':([18,],[31,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'objectlist':([0,2,],[1,8,]),'object':([0,2,],[2,2,]),'meshspec':([0,2,],[3,3,]),'string':([0,2,5,18,],[4,4,11,22,]),'keyvaluelist':([9,17,],[12,20,]),'keyvalue':([9,17,],[13,13,]),'value':([18,],[21,]),'integer':([18,],[23,]),'float':([18,],[24,]),'boolean':([18,],[25,]),'list':([18,],[26,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> objectlist","S'",1,None,None,None),
+  ('objectlist -> object','objectlist',1,'p_objectlist','CommentParser.py',156),
+  ('objectlist -> object objectlist','objectlist',2,'p_objectlist','CommentParser.py',157),
+  ('object -> meshspec','object',1,'p_object','CommentParser.py',163),
+  ('object -> meshspec SETTINGS keyvaluelist','object',3,'p_object','CommentParser.py',164),
+  ('meshspec -> string','meshspec',1,'p_meshspec','CommentParser.py',179),
+  ('meshspec -> string AS NAME','meshspec',3,'p_meshspec','CommentParser.py',180),
+  ('meshspec -> FILE string','meshspec',2,'p_meshspec','CommentParser.py',181),
+  ('meshspec -> FILE string AS NAME','meshspec',4,'p_meshspec','CommentParser.py',182),
+  ('keyvaluelist -> keyvalue','keyvaluelist',1,'p_keyvaluelist','CommentParser.py',187),
+  ('keyvaluelist -> keyvalue COMMA keyvaluelist','keyvaluelist',3,'p_keyvaluelist','CommentParser.py',188),
+  ('keyvalue -> NAME EQUAL value','keyvalue',3,'p_keyvalue','CommentParser.py',194),
+  ('value -> string','value',1,'p_value','CommentParser.py',198),
+  ('value -> integer','value',1,'p_value','CommentParser.py',199),
+  ('value -> float','value',1,'p_value','CommentParser.py',200),
+  ('value -> boolean','value',1,'p_value','CommentParser.py',201),
+  ('value -> list','value',1,'p_value','CommentParser.py',202),
+  ('string -> SSTRING','string',1,'p_string','CommentParser.py',206),
+  ('string -> DSTRING','string',1,'p_string','CommentParser.py',207),
+  ('list -> LIST','list',1,'p_list','CommentParser.py',211),
+  ('integer -> INTEGER','integer',1,'p_integer','CommentParser.py',215),
+  ('float -> FLOAT','float',1,'p_float','CommentParser.py',219),
+  ('boolean -> True','boolean',1,'p_boolean','CommentParser.py',223),
+  ('boolean -> False','boolean',1,'p_boolean','CommentParser.py',224),
+]
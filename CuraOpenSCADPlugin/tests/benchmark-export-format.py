@@ -0,0 +1,45 @@
+# Compares file size and load time of ASCII and binary STL written by openscad
+#   python benchmark-export-format.py [file.scad] [openscad]
+import os
+import sys
+import time
+import struct
+import subprocess
+import tempfile
+
+source = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "..", "examples", "example.scad")
+cmd = sys.argv[2] if len(sys.argv) > 2 else "openscad"
+
+
+def load_ascii(path):
+    vertices = []
+    with open(path, 'r') as f:
+        for line in f:
+            words = line.split()
+            if words and words[0] == 'vertex':
+                vertices.append((float(words[1]), float(words[2]), float(words[3])))
+    return len(vertices) // 3
+
+
+def load_binary(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    count = struct.unpack_from('<I', data, 80)[0]
+    vertices = [v for facet in struct.iter_unpack('<12fH', data[84:84 + count * 50]) for v in facet[3:12]]
+    return len(vertices) // 9
+
+
+formats = [("asciistl", [], load_ascii), ("binstl", ["--export-format", "binstl"], load_binary)]
+tmp = tempfile.mkdtemp()
+for name, flags, loader in formats:
+    out = os.path.join(tmp, name + ".stl")
+    start = time.perf_counter()
+    subprocess.run([cmd] + flags + ["-o", out, source], check=True, stderr=subprocess.DEVNULL)
+    render = time.perf_counter() - start
+    start = time.perf_counter()
+    facets = loader(out)
+    load = time.perf_counter() - start
+    print("{0:10s} facets: {1:8d} size: {2:12d} bytes render: {3:7.3f}s load: {4:7.3f}s".format(
+        name, facets, os.path.getsize(out), render, load))
+    os.remove(out)
+os.rmdir(tmp)
@@ -0,0 +1,59 @@
+# Load time and peak memory of MeshLoader against facet by facet parsing
+#   python benchmark-mesh-loader.py [triangles]
+import os
+import sys
+import time
+import struct
+import tempfile
+import tracemalloc
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import MeshLoader  # @UnresolvedImport
+
+triangles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+facets = numpy.zeros(triangles, dtype=MeshLoader._binary_facet)
+facets['vertices'] = numpy.random.rand(triangles, 3, 3) * 100
+
+tmp = tempfile.mkdtemp()
+binary = os.path.join(tmp, "binary.stl")
+with open(binary, 'wb') as f:
+    f.write(b'\0' * 80 + struct.pack('<I', triangles) + facets.tobytes())
+ascii = os.path.join(tmp, "ascii.stl")
+with open(ascii, 'w') as f:
+    f.write("solid benchmark\n")
+    for v in facets['vertices']:
+        f.write(" facet normal 0 0 0\n  outer loop\n")
+        for x, y, z in v:
+            f.write("   vertex {0:e} {1:e} {2:e}\n".format(x, y, z))
+        f.write("  endloop\n endfacet\n")
+    f.write("endsolid benchmark\n")
+
+
+def per_facet(path):
+    vertices = []
+    with open(path, 'rb') as f:
+        f.seek(84)
+        for facet in struct.iter_unpack('<12fH', f.read()):
+            vertices.append(facet[3:6])
+            vertices.append(facet[6:9])
+            vertices.append(facet[9:12])
+    return numpy.array(vertices, dtype=numpy.float32)
+
+
+for name, path, loader in [("per facet", binary, per_facet),
+                           ("binary", binary, MeshLoader.load),
+                           ("ascii", ascii, MeshLoader.load)]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    loader(path)
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("{0:10s} size: {1:12d} bytes load: {2:7.3f}s peak: {3:8.1f}MB raw: {4:8.1f}MB".format(
+        name, os.path.getsize(path), duration, peak / 2**20, triangles * 36 / 2**20))
+
+os.remove(binary)
+os.remove(ascii)
+os.rmdir(tmp)
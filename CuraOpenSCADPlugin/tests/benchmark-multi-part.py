@@ -0,0 +1,51 @@
+# Wall-clock time of one openscad run per part against a single run for all parts
+#   python benchmark-multi-part.py [file.scad] [openscad]
+import os
+import re
+import sys
+import time
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import MultiPartRender  # @UnresolvedImport
+
+source = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else
+                         os.path.join(os.path.dirname(__file__), "..", "examples", "example.scad"))
+cmd = sys.argv[2] if len(sys.argv) > 2 else "openscad"
+
+with open(source) as f:
+    comments = re.findall(r'/\*cura-export(.*?)\*/', f.read(), re.S)
+expressions = list(dict.fromkeys(e for comment in comments for e in re.findall(r"'([^']*)'", comment)))
+print("{0} parts in {1}".format(len(expressions), source))
+
+tmp = tempfile.mkdtemp()
+
+
+def render(wrapper):
+    name = os.path.join(tmp, "{0}.scad".format(abs(hash(wrapper))))
+    with open(name, 'w') as f:
+        f.write(wrapper)
+    subprocess.run([cmd, '-o', name + '.stl', name], check=True, stderr=subprocess.DEVNULL)
+    os.remove(name)
+    os.remove(name + '.stl')
+
+
+def per_part(workers):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(render, ['!{0};\ninclude <{1}>;\n'.format(e, source) for e in expressions]))
+
+
+def single_pass():
+    render(MultiPartRender.wrapperSource(expressions, source, 2000))
+
+
+for name, run in [("per part, sequential", lambda: per_part(1)),
+                  ("per part, parallel", lambda: per_part(os.cpu_count())),
+                  ("single pass", single_pass)]:
+    start = time.perf_counter()
+    run()
+    print("{0:22s} {1:7.3f}s".format(name, time.perf_counter() - start))
+
+os.rmdir(tmp)
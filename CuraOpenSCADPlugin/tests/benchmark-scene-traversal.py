@@ -0,0 +1,84 @@
+# Time and allocations of collecting the scene items for write back, recursive items() against sceneItems
+#   python benchmark-scene-traversal.py [meshes] [depth]
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from SceneIndex import Index, sceneItems  # @UnresolvedImport
+
+meshes = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+depth = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+
+class Decorator(object):
+    # like the former OpenSCADDecorator.items, searches the top group up to the root
+    def __init__(self, node, file_name, obj):
+        self.node = node
+        self.file_name = file_name
+        self.obj = obj
+
+    def items(self):
+        node = self.node
+        topGroup = node
+        while node:
+            if node.hasDecoration('isGroup'):
+                topGroup = node
+            node = node.getParent()
+        return {Index(self.file_name, topGroup, self.obj): {}}
+
+
+class Node(object):
+    def __init__(self, parent=None, group=False):
+        self._parent = parent
+        self._children = []
+        self._group = group
+        self._decorator = None
+        if parent:
+            parent._children.append(self)
+
+    def getParent(self):
+        return self._parent
+
+    def getChildren(self):
+        return self._children
+
+    def hasDecoration(self, name):
+        return name == 'isGroup' and self._group or name in ('items', 'getOverwrites') and self._decorator
+
+    def callDecoration(self, name):
+        return getattr(self._decorator, name)()
+
+    def getDecorator(self, decorator_type):
+        return self._decorator
+
+
+# groups nested depth deep, meshes spread over 100 top groups
+root = Node()
+for index in range(meshes):
+    if index % (meshes // 100 or 1) == 0:
+        parent = Node(root, True)
+        for _ in range(depth - 1):
+            parent = Node(parent, True)
+    node = Node(parent)
+    node._decorator = Decorator(node, "example.scad", "part{0}".format(index))
+
+
+def recursive(node):
+    items = node.callDecoration("items") if node.hasDecoration("getOverwrites") else {}
+    for child in node.getChildren():
+        items.update(recursive(child))
+    return items
+
+
+print("{0} meshes, groups {1} deep".format(meshes, depth))
+for name, run in [("recursive items()", lambda: list(recursive(root))),
+                  ("sceneItems", lambda: sceneItems(root, Decorator))]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("{0:18s} {1:7.3f}s {2:8.1f} KB peak, {3} items".format(name, elapsed, peak / 1024, len(result)))
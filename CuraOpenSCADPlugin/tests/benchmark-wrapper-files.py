@@ -0,0 +1,52 @@
+# File system cost of the wrapper files written for every part: kept in the system temp folder
+# (as before) against the per-session scratch folder, removed after each render
+#   python benchmark-wrapper-files.py [parts] [file.scad]
+import os
+import sys
+import time
+import uuid
+import shutil
+import tempfile
+import importlib
+
+plugin = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.dirname(os.path.abspath(plugin)))
+Renderer = importlib.import_module(os.path.basename(os.path.abspath(plugin)) + ".Renderer")
+
+parts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+source = os.path.abspath(sys.argv[2] if len(sys.argv) > 2 else os.path.join(plugin, "examples", "example.scad"))
+wrapper = '!reinforcment(d = {0});\ninclude <' + source + '>;\n'
+
+
+def write(directory, remove, sync=False):
+    names = []
+    for index in range(parts):
+        name = os.path.join(directory, "{}.scad".format(uuid.uuid4()))
+        with open(name, 'w') as f:
+            f.write(wrapper.format(index))
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        if remove:
+            os.remove(name)
+        else:
+            names.append(name)
+    return names
+
+
+# a folder in the system temp folder stands in for it, so the files can be removed afterwards
+kept = tempfile.mkdtemp()
+scratch = Renderer.scratchDirectory()
+print("{0} wrappers of {1} bytes, temp folder {2}, scratch folder {3}".format(
+    parts, len(wrapper), tempfile.gettempdir(), scratch))
+for name, directory, remove, sync in [("temp folder, kept", kept, False, False),
+                                      ("temp folder, kept, fsync", kept, False, True),
+                                      ("scratch, removed", scratch, True, False)]:
+    start = time.perf_counter()
+    names = write(directory, remove, sync)
+    elapsed = time.perf_counter() - start
+    left = sum(os.path.getsize(n) for n in names)
+    print("{0:26s} {1:7.3f}s  {2:6d} files / {3:9d} bytes left behind".format(name, elapsed, len(names), left))
+    for n in names:
+        os.remove(n)
+shutil.rmtree(kept)
@@ -0,0 +1,86 @@
+# Splits rigid transformations off part expressions and checks their matrices against openscad's order
+#   python test-instancing.py
+import os
+import sys
+import math
+import importlib
+
+import numpy
+
+plugin = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.dirname(os.path.abspath(plugin)))
+package = os.path.basename(os.path.abspath(plugin))
+Instancing = importlib.import_module(package + ".Instancing")
+MeshLoader = importlib.import_module(package + ".MeshLoader")
+
+split = Instancing.splitRigidTransform
+
+# literal translate/rotate in front of the expression are split off, in order
+assert split("translate([10, 0, 0]) rotate([0, 0, 90]) part()") == \
+    ("part()", [("translate", (10, 0, 0)), ("rotate", (0, 0, 90))])
+assert split(" translate(v = [1, 2.5, -3]) rotate(a=[0,45,0]) part(d = 14) ") == \
+    ("part(d = 14)", [("translate", (1, 2.5, -3)), ("rotate", (0, 45, 0))])
+# anything else stays in the expression
+for source in ["part()",
+               "rotate(v=[0, 0, 1]) part()",
+               "translate(a=[1, 2, 3]) part()",
+               "rotate(a=[1, 2, 3], v=[1, 0, 0]) part()",
+               "rotate(90) part()",
+               "translate([x, 0, 0]) part()",
+               "translate([1, 2]) part()",
+               "translate([1, 2, 3]) { part(); other(); }",
+               "scale([2, 2, 2]) part()",
+               "translate([1, 2, 3])"]:
+    assert split(source) == (source.strip(), []), (source, split(source))
+# a transformation that is not understood ends the split
+assert split("translate([1, 0, 0]) mirror([1, 0, 0]) part()") == ("mirror([1, 0, 0]) part()",
+                                                                   [("translate", (1, 0, 0))])
+print("split")
+
+
+def rotation(axis, angle):
+    c, s = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+    return {0: numpy.array([[1, 0, 0], [0, c, -s], [0, s, c]]),
+            1: numpy.array([[c, 0, s], [0, 1, 0], [-s, 0, c]]),
+            2: numpy.array([[c, -s, 0], [s, c, 0], [0, 0, 1]])}[axis]
+
+
+def openscad(transforms, points):
+    # what openscad does to points (n, 3): the innermost transformation first
+    for kind, values in reversed(transforms):
+        if kind == 'translate':
+            points = points + numpy.array(values)
+        else:
+            # rotate([a, b, c]) rotates around x, then y, then z
+            for axis in range(3):
+                points = points.dot(rotation(axis, values[axis]).T)
+    return points
+
+
+points = numpy.array([[1, 2, 3], [-4, 0.5, 2], [0, 0, 0], [10, -10, 5]], dtype=numpy.float64)
+for source in ["translate([10, 0, 0]) rotate([0, 0, 90]) p()",
+               "rotate([30, 45, 60]) p()",
+               "rotate([0, 90, 0]) translate([1, 2, 3]) p()",
+               "translate([5, -5, 2]) rotate([90, 0, 0]) translate([0, 0, 7]) rotate([0, 0, -30]) p()"]:
+    core, transforms = split(source)
+    assert core == "p()"
+    matrix = Instancing.transformMatrix(transforms)
+    # the matrix works on Cura coordinates
+    cura = MeshLoader.toCura(points.astype(numpy.float32)).astype(numpy.float64)
+    moved = cura.dot(matrix[:3, :3].T) + matrix[:3, 3]
+    expected = MeshLoader.toCura(openscad(transforms, points).astype(numpy.float32))
+    assert numpy.allclose(moved, expected, atol=1e-4), (source, moved, expected)
+    # rigid: no scaling or mirroring
+    assert numpy.isclose(numpy.linalg.det(matrix[:3, :3]), 1)
+print("transformMatrix")
+
+# the difference between two placements takes a mesh placed by one to the other
+old = Instancing.transformMatrix(split("rotate([0, 0, 90]) p()")[1])
+new = Instancing.transformMatrix(split("rotate([0, 0, 45]) p()")[1])
+assert not Instancing.sameTransformation(old, new)
+assert numpy.allclose(old.dot(Instancing.relativeTransformation(old, new)), new)
+assert numpy.allclose(Instancing.relativeTransformation(old, None), numpy.linalg.inv(old))
+assert numpy.allclose(Instancing.relativeTransformation(None, new), new)
+assert Instancing.sameTransformation(None, numpy.identity(4))
+assert Instancing.sameTransformation(old, Instancing.transformMatrix(split("rotate(a = [0, 0, 90]) p()")[1]))
+print("relativeTransformation")
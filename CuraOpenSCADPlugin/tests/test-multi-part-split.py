@@ -0,0 +1,59 @@
+# Splits meshes of several parts laid out by MultiPartRender back into parts, no openscad needed
+#   python test-multi-part-split.py
+import os
+import sys
+import importlib
+
+import numpy
+
+plugin = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.dirname(os.path.abspath(plugin)))
+package = os.path.basename(os.path.abspath(plugin))
+MultiPartRender = importlib.import_module(package + ".MultiPartRender")
+
+spacing = 2000
+
+
+def triangle(x, y, size=10):
+    return [(x, y, 0), (x + size, y, 0), (x, y + size, 0)]
+
+
+def layout(parts):
+    # vertices of one render, parts [[(x, y)]] are triangles relative to the origin of their part
+    facets = []
+    for index, triangles in enumerate(parts):
+        dx, dy = MultiPartRender.offset(index, len(parts), spacing)
+        facets.extend(triangle(x + dx, y + dy) for x, y in triangles)
+    return numpy.array(facets, dtype=numpy.float32).reshape(-1, 3)
+
+
+# every part is moved back to its own origin, indexed meshes split the same way
+parts = [[(0, 0), (-500, 300)], [(100, 100)], [(0, -900)], [(900, 900), (-900, -900)], [(5, 5)]]
+vertices = layout(parts)
+result = MultiPartRender.split(vertices, None, len(parts), spacing)
+assert result is not None
+for triangles, part in zip(parts, result):
+    expected = numpy.array([triangle(x, y) for x, y in triangles], dtype=numpy.float32)
+    assert numpy.allclose(part, expected), (part, expected)
+indexed = MultiPartRender.split(vertices, numpy.arange(len(vertices)).reshape(-1, 3), len(parts), spacing)
+assert all(numpy.allclose(a, b) for a, b in zip(result, indexed))
+print("split")
+
+# a facet across the border between two slots can not be split
+vertices = numpy.array(triangle(990, 0) + triangle(spacing, 0), dtype=numpy.float32)
+assert MultiPartRender.split(vertices, None, 2, spacing) is None
+# a facet left of the first slot
+vertices = numpy.array(triangle(-1500, 0) + triangle(spacing, 0), dtype=numpy.float32)
+assert MultiPartRender.split(vertices, None, 2, spacing) is None
+print("facet across slots")
+
+# geometry more than spacing/2 from the origin of its part lands in the slot of the next part, this is only
+# noticed when it leaves a slot empty: a part entirely beyond spacing/2 must not end up with its neighbour
+vertices = layout([[(1200, 0)], [(0, 0)]])
+assert MultiPartRender.split(vertices, None, 2, spacing) is None
+vertices = layout([[(0, 0)], [(0, 0)], [(0, -1200)], [(0, 0)]])
+assert MultiPartRender.split(vertices, None, 4, spacing) is None
+# a part without geometry
+vertices = layout([[(0, 0)], [], [(0, 0)]])
+assert MultiPartRender.split(vertices, None, 3, spacing) is None
+print("empty slot")
@@ -0,0 +1,82 @@
+# Runs jobs through a RenderServer with stub workers, no openscad needed
+#   python test-render-server.py [jobs] [workers]
+import os
+import sys
+import time
+import shutil
+import tempfile
+import importlib
+import threading
+
+plugin = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.dirname(os.path.abspath(plugin)))
+package = os.path.basename(os.path.abspath(plugin))
+RenderServer = importlib.import_module(package + ".RenderServer")
+RenderError = importlib.import_module(package + ".OpenSCADProcess").RenderError
+
+jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+tmp = tempfile.mkdtemp()
+
+server = RenderServer.RenderServer(None, workers=workers, stub=True)
+start = time.perf_counter()
+futures = [server.submit(os.path.join(tmp, "{0}.scad".format(i)), os.path.join(tmp, "{0}.stl".format(i)))
+           for i in range(jobs)]
+for future in futures:
+    mesh, result = future.result()
+    assert os.path.getsize(mesh) == 84 + 4 * 50, mesh
+    assert result.returncode == 0
+print("{0} jobs on {1} workers: {2:.3f}s".format(jobs, workers, time.perf_counter() - start))
+server.stop()
+
+# a cancelled job is answered by its worker, which stays for the next job
+server = RenderServer.RenderServer(None, workers=1, stub=True, stub_delay=5)
+cancel = threading.Event()
+future = server.submit(os.path.join(tmp, "slow.scad"), os.path.join(tmp, "slow.stl"), cancel=cancel)
+time.sleep(0.5)
+cancel.set()
+try:
+    future.result(timeout=2)
+    raise AssertionError("not cancelled")
+except RenderError as e:
+    assert e.result.cancelled, e
+    print("cancelled: {0}".format(e))
+mesh, result = server.render(os.path.join(tmp, "next.scad"), os.path.join(tmp, "next.stl"))
+assert result.returncode == 0
+server.stop()
+
+# a cancelled job takes its openscad run with it, openscad is a script here that writes its pid and sleeps
+if sys.platform != 'win32':
+    openscad = os.path.join(tmp, "openscad")
+    pid_file = os.path.join(tmp, "openscad.pid")
+    with open(openscad, 'w') as f:
+        f.write('#!/bin/sh\n'
+                'if [ "$1" = "--version" ]; then echo "OpenSCAD version 2021.01"; exit 0; fi\n'
+                'echo $$ > "{0}"\n'
+                'exec sleep 37\n'.format(pid_file))
+    os.chmod(openscad, 0o755)
+    open(os.path.join(tmp, "child.scad"), 'w').close()
+
+    server = RenderServer.RenderServer(openscad, workers=1)
+    cancel = threading.Event()
+    future = server.submit(os.path.join(tmp, "child.scad"), os.path.join(tmp, "child.stl"), cancel=cancel)
+    deadline = time.monotonic() + 10
+    while not os.path.exists(pid_file) or not open(pid_file).read().strip():
+        assert time.monotonic() < deadline, "openscad not started"
+        time.sleep(0.05)
+    pid = int(open(pid_file).read())
+    cancel.set()
+    try:
+        future.result(timeout=10)
+        raise AssertionError("not cancelled")
+    except RenderError as e:
+        assert e.result.cancelled, e
+        print("cancelled with openscad: {0}".format(e))
+    try:
+        os.kill(pid, 0)
+        raise AssertionError("openscad {0} still running".format(pid))
+    except ProcessLookupError:
+        pass
+    server.stop()
+
+shutil.rmtree(tmp)
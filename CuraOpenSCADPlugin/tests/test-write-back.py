@@ -0,0 +1,174 @@
+# Writes cura-export blocks back into .scad files with WriteBack and checks the result against a rescan
+#   python test-write-back.py
+import os
+import sys
+import shutil
+import tempfile
+import importlib
+
+plugin = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.dirname(os.path.abspath(plugin)))
+package = os.path.basename(os.path.abspath(plugin))
+WriteBack = importlib.import_module(package + ".WriteBack")
+CommentScanner = importlib.import_module(package + ".CommentScanner")
+
+source = ("// Größe in mm\n"
+          "/*cura-export 'base()' AS Base */\n"
+          "/*cura-export 'part(d = 14)' AS Teil_ä {\"infill_sparse_density\": 20} */\n"
+          "module base() { cube(10); }\n"
+          "s = \"/*cura-export 'not()' AS InString */\";\n"
+          "/*cura-export 'part(d = 24)' AS Last */\n"
+          "module part(d) { cylinder(d = d, h = 5); }\n").encode('utf-8')
+
+tmp = tempfile.mkdtemp()
+file_name = os.path.join(tmp, "test.scad")
+
+
+def reset():
+    for name in os.listdir(tmp):
+        os.remove(os.path.join(tmp, name))
+    with open(file_name, 'wb') as f:
+        f.write(source)
+    return list(CommentScanner.scanFile(file_name))
+
+
+def check(index):
+    # the returned index is what a rescan of the file finds, every range holds its comment
+    assert index is not None
+    assert index == list(CommentScanner.scanFile(file_name)), (index, list(CommentScanner.scanFile(file_name)))
+    with open(file_name, 'rb') as f:
+        data = f.read()
+    for comment in index:
+        assert data[comment.offset:comment.offset + comment.length].decode('utf-8') == WriteBack.blockText(comment)
+    assert not [name for name in os.listdir(tmp) if name.startswith('.')], "temporary file left"
+    return data
+
+
+# a change that fits is written at the place of the old block, padded with spaces, the file keeps its size
+comments = reset()
+inode = os.stat(file_name).st_ino
+index = WriteBack.patch(file_name, comments, {comments[0]: "/*cura-export 'base()' AS B */".encode('utf-8')})
+data = check(index)
+assert len(data) == len(source)
+assert os.stat(file_name).st_ino == inode
+assert [comment.offset for comment in index] == [comment.offset for comment in comments]
+assert index[0].text == " 'base()' AS B    "
+assert WriteBack.normalized(WriteBack.blockText(index[0])) == "/*cura-export 'base()' AS B*/"
+assert not os.path.exists(file_name + '.old')
+print("patch in place")
+
+# a change that does not fit is refused by patch, rewrite moves the later blocks and keeps a backup
+comments = reset()
+changes = {comments[1]: "/*cura-export 'part(d = 14)' AS Teil_ä {\"infill_sparse_density\": 20, \"wall_line_count\": 4} */"
+                        .encode('utf-8')}
+assert WriteBack.patch(file_name, comments, changes) is None
+with open(file_name, 'rb') as f:
+    assert f.read() == source
+data = check(WriteBack.rewrite(file_name, comments, changes))
+with open(file_name + '.old', 'rb') as f:
+    assert f.read() == source
+index = list(CommentScanner.scanFile(file_name))
+assert index[0] == comments[0]
+assert index[2].offset > comments[2].offset
+assert '"wall_line_count": 4' in index[1].text
+# the slack lets the next change of the block fit
+changes = {index[1]: "/*cura-export 'part(d = 14)' AS Teil_ä {\"infill_sparse_density\": 30, \"wall_line_count\": 5} */"
+                     .encode('utf-8')}
+check(WriteBack.patch(file_name, index, changes))
+print("rewrite")
+
+# _reindex: blocks after a replaced one move by the size difference, blocks inside of new text are found
+comments = reset()
+written = {comments[0]: b"/*cura-export 'base()' AS Base */ /*cura-export 'extra()' AS Extra */",
+           comments[1]: b"/*cura-export 'p()' AS P*/"}
+index = WriteBack._reindex(comments, written)
+assert [comment.text for comment in index] == [" 'base()' AS Base ", " 'extra()' AS Extra ", " 'p()' AS P",
+                                               comments[2].text]
+shift = sum(len(data) - comment.length for comment, data in written.items())
+assert index[0].offset == comments[0].offset
+assert index[1].offset == comments[0].offset + len(b"/*cura-export 'base()' AS Base */ ")
+assert index[3].offset == comments[2].offset + shift
+print("reindex")
+
+# a range that changed on disk since it was scanned is not written, neither by patch nor by rewrite
+for write in (lambda c, ch: WriteBack.patch(file_name, c, ch),
+              lambda c, ch: WriteBack.rewrite(file_name, c, ch)):
+    comments = reset()
+    edited = source.replace(b"AS Last", b"AS Lost")
+    with open(file_name, 'wb') as f:
+        f.write(edited)
+    assert write(comments, {comments[2]: b"/*cura-export 'part(d = 24)' AS L */"}) is None
+    with open(file_name, 'rb') as f:
+        assert f.read() == edited
+    assert not os.path.exists(file_name + '.old')
+    assert not [name for name in os.listdir(tmp) if name.startswith('.')], "temporary file left"
+print("changed on disk")
+
+# offsets and lengths are bytes: multibyte text before and inside of the blocks
+comments = reset()
+assert comments[1].length == len(WriteBack.blockText(comments[1]).encode('utf-8'))
+assert len(WriteBack.blockText(comments[1])) < comments[1].length
+text = "/*cura-export 'part(d = 14)' AS Größe_✓ */"
+# the padding is counted in bytes, the file keeps its size
+data = check(WriteBack.patch(file_name, comments, {comments[1]: text.encode('utf-8')}))
+assert len(data) == len(source)
+index = list(CommentScanner.scanFile(file_name))
+assert index[1].text.rstrip() == " 'part(d = 14)' AS Größe_✓"
+with open(file_name, 'rb') as f:
+    assert f.read().decode('utf-8').count("Größe") == 2
+# a change longer in bytes than the block does not fit, even if it has fewer characters
+comments = reset()
+text = "/*cura-export 'base()' AS " + "✓" * 3 + " */"
+assert len(text) < comments[0].length < len(text.encode('utf-8'))
+assert WriteBack.patch(file_name, comments, {comments[0]: text.encode('utf-8')}) is None
+check(WriteBack.rewrite(file_name, comments, {comments[0]: text.encode('utf-8')}))
+print("multibyte")
+
+
+def interrupted(changes):
+    # a patch interrupted after its journal was written, half of every block is written
+    ranges = [(comment.offset, source[comment.offset:comment.offset + comment.length]) for comment in changes]
+    WriteBack._writeJournal(file_name, len(source), ranges)
+    with open(file_name, 'r+b') as f:
+        for comment, data in changes.items():
+            data = WriteBack._pad(data, comment.length)
+            f.seek(comment.offset)
+            f.write(data[:len(data) // 2])
+
+
+# the old blocks are restored on the next scan
+journal = WriteBack.journalName(file_name)
+comments = reset()
+interrupted({comments[0]: b"/*cura-export 'x()' AS X */", comments[2]: b"/*cura-export 'y()' AS Y */"})
+assert os.path.exists(journal)
+assert WriteBack.recover(file_name)
+with open(file_name, 'rb') as f:
+    assert f.read() == source
+assert not os.path.exists(journal)
+assert not WriteBack.recover(file_name)
+# patch and rewrite recover first, the scanned ranges match the restored file
+comments = reset()
+interrupted({comments[1]: b"/*cura-export 'x()' AS X */"})
+check(WriteBack.patch(file_name, comments, {comments[0]: b"/*cura-export 'b()' AS B */"}))
+comments = reset()
+interrupted({comments[1]: b"/*cura-export 'x()' AS X */"})
+check(WriteBack.rewrite(file_name, comments, {comments[0]: b"/*cura-export 'b()' AS B */"}))
+# an incomplete journal was written before the file was touched, it is dropped
+comments = reset()
+WriteBack._writeJournal(file_name, len(source), [(comments[0].offset, b"garbage")])
+with open(journal, 'r+b') as f:
+    f.truncate(os.path.getsize(journal) - 3)
+assert not WriteBack.recover(file_name)
+assert not os.path.exists(journal)
+with open(file_name, 'rb') as f:
+    assert f.read() == source
+# a file of another size was replaced since, e.g. by an editor, it is left as it is
+comments = reset()
+WriteBack._writeJournal(file_name, len(source) + 1, [(comments[0].offset, b"garbage")])
+assert not WriteBack.recover(file_name)
+assert not os.path.exists(journal)
+with open(file_name, 'rb') as f:
+    assert f.read() == source
+print("journal")
+
+shutil.rmtree(tmp)